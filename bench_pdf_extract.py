@@ -0,0 +1,90 @@
+# bench_pdf_extract.py
+"""
+Compare PDF text extraction engines on sample PDFs.
+
+Usage:
+    python bench_pdf_extract.py path/to/a.pdf [more.pdf ...] [--engines pdfium,pdfplumber] [--repeat 3]
+
+For each file and engine it reports pages/second (best of --repeat runs, in-process,
+single core) and, against the first engine listed as baseline, character parity:
+the share of non-whitespace characters the two engines have in common (multiset
+overlap per page) plus the pages whose parity falls below --warn-below.
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from services.pdf_extract import EXTRACTION_ENGINES, count_pages
+
+
+def _chars(text: str) -> Counter:
+    return Counter(c for c in text if not c.isspace())
+
+
+def parity(a: str, b: str) -> float:
+    """Overlap of the non-whitespace character multisets, 1.0 = identical content."""
+    ca, cb = _chars(a), _chars(b)
+    total = max(sum(ca.values()), sum(cb.values()))
+    if not total:
+        return 1.0
+    return sum((ca & cb).values()) / total
+
+
+def run_engine(engine: str, path: str, pages: int, repeat: int) -> Tuple[float, List[str]]:
+    best = None
+    texts: List[str] = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = EXTRACTION_ENGINES[engine](path, 0, pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        texts = [text for _, text in result]
+    return best, texts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--engines", default="pdfium,pdfplumber")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warn-below", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = [e for e in engines if e not in EXTRACTION_ENGINES]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)}")
+
+    totals: Dict[str, List[float]] = {e: [0, 0.0, 0] for e in engines}  # pages, seconds, chars
+    for path in args.pdfs:
+        pages = count_pages(path)
+        print(f"\n{path}: {pages} pages")
+        baseline = None
+        for engine in engines:
+            elapsed, texts = run_engine(engine, path, pages, args.repeat)
+            chars = sum(len(t) for t in texts)
+            totals[engine][0] += pages
+            totals[engine][1] += elapsed
+            totals[engine][2] += chars
+            line = f"  {engine:<11} {pages / elapsed if elapsed else float('inf'):9.1f} pages/s  {chars:9d} chars"
+            if baseline is None:
+                baseline = (engine, texts)
+            else:
+                scores = [parity(a, b) for a, b in zip(baseline[1], texts)]
+                mean = sum(scores) / len(scores) if scores else 1.0
+                low = [i + 1 for i, s in enumerate(scores) if s < args.warn_below]
+                line += f"  parity vs {baseline[0]}: {mean:.3f}"
+                if low:
+                    line += f"  (below {args.warn_below} on pages {low[:20]}{'...' if len(low) > 20 else ''})"
+            print(line)
+
+    print("\nTotal")
+    for engine, (pages, seconds, chars) in totals.items():
+        print(f"  {engine:<11} {pages / seconds if seconds else float('inf'):9.1f} pages/s  {int(chars):9d} chars")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
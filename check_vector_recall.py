@@ -0,0 +1,134 @@
+# check_vector_recall.py
+"""
+Check top-k recall of quantized vector storage against float32.
+
+Usage:
+    python check_vector_recall.py [--vectors 100000] [--dim 1024] [--queries 200] [--top-k 10]
+    python check_vector_recall.py --store data/vectors          # vectors from the local vector store
+    python check_vector_recall.py --embedding-cache data/embeddings.sqlite3
+
+Without a source, clustered synthetic unit vectors are generated. Queries are
+stored vectors with Gaussian noise (--noise) added. For each dtype (--dtypes)
+it reports recall@k against the exact float32 ranking, the largest score error,
+storage bytes per vector / GB per million vectors and query time. Recall below
+--warn-below is flagged and makes the exit status non-zero.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from services.vector_codec import DTYPES, QuantizedMatrix, bytes_per_vector
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # Embeddings cluster by topic; uniform random vectors would be almost orthogonal
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    return centers[assignment] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def store_vectors(root: str) -> np.ndarray:
+    from services.vector_store import _Partition
+
+    matrices: List[np.ndarray] = []
+    for dirpath, _, filenames in os.walk(root):
+        if "log.jsonl" in filenames or "meta.json" in filenames:
+            vectors = _Partition(dirpath).live_vectors()
+            if len(vectors):
+                matrices.append(vectors)
+    if not matrices:
+        raise SystemExit(f"No vectors found under {root}")
+    dims = {m.shape[1] for m in matrices}
+    if len(dims) > 1:
+        raise SystemExit(f"Mixed vector dimensions under {root}: {sorted(dims)}")
+    return np.concatenate(matrices)
+
+
+def cached_vectors(path: str, limit: int) -> np.ndarray:
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT dtype, vector FROM embeddings LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise SystemExit(f"No embeddings in {path}")
+    return np.stack([np.frombuffer(blob, dtype=np.dtype(dtype)).astype(np.float32) for dtype, blob in rows])
+
+
+def unit(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--store", help="local vector store directory (LOCAL_VECTOR_STORE_DIR)")
+    source.add_argument("--embedding-cache", help="embedding cache database (EMBEDDING_CACHE_PATH)")
+    parser.add_argument("--vectors", type=int, default=100000, help="synthetic vectors, or the cap on cached ones")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--dtypes", default="float16,int8")
+    parser.add_argument("--warn-below", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dtypes = [d.strip().lower() for d in args.dtypes.split(",") if d.strip()]
+    unknown = [d for d in dtypes if d not in DTYPES]
+    if unknown:
+        parser.error(f"unknown dtype(s): {', '.join(unknown)}")
+
+    rng = np.random.default_rng(args.seed)
+    if args.store:
+        matrix = store_vectors(args.store)
+    elif args.embedding_cache:
+        matrix = cached_vectors(args.embedding_cache, args.vectors)
+    else:
+        matrix = synthetic_vectors(args.vectors, args.dim, args.clusters, rng)
+    matrix = unit(matrix)
+    count, dim = matrix.shape
+    k = min(args.top_k, count)
+    picks = rng.integers(0, count, size=args.queries)
+    queries = unit(matrix[picks] + args.noise / np.sqrt(dim) * rng.standard_normal((args.queries, dim)).astype(np.float32))
+
+    exact = QuantizedMatrix.encode(matrix, "float32")
+    baseline_scores = [exact.dot(q) for q in queries]
+    baseline = [set(top_k(s, k).tolist()) for s in baseline_scores]
+    print(f"{count} vectors x {dim} dims, {len(queries)} queries, recall@{k} against float32")
+    print(f"{'dtype':<8} {'recall':>8} {'min':>6} {'max err':>9} {'B/vector':>9} {'GB/1M':>7} {'ms/query':>9}")
+
+    failed = False
+    for dtype in ["float32"] + [d for d in dtypes if d != "float32"]:
+        encoded = exact if dtype == "float32" else QuantizedMatrix.encode(matrix, dtype)
+        recalls, max_error, elapsed = [], 0.0, 0.0
+        for q, expected, reference in zip(queries, baseline, baseline_scores):
+            start = time.perf_counter()
+            scores = encoded.dot(q)
+            found = top_k(scores, k)
+            elapsed += time.perf_counter() - start
+            recalls.append(len(expected.intersection(found.tolist())) / k)
+            max_error = max(max_error, float(np.max(np.abs(scores - reference))))
+        recall = float(np.mean(recalls))
+        size = bytes_per_vector(dim, dtype)
+        flag = "  below --warn-below" if recall < args.warn_below else ""
+        failed = failed or bool(flag)
+        print(f"{dtype:<8} {recall:>8.4f} {min(recalls):>6.2f} {max_error:>9.5f} {size:>9} "
+              f"{size * 1e6 / 1e9:>7.2f} {1000 * elapsed / len(queries):>9.2f}{flag}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,64 @@
 # db\database.py
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from sqlalchemy.sql import func
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from config import settings
+from services.cache import TTLCache
+from services.metrics import timed
 # Use the keys from the settings object
 DATABASE_URL=settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+POOL_METRIC_PREFIX = "db.pool."
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        with timed(POOL_METRIC_PREFIX + "checkout_wait.sync"):
+            return super()._do_get()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        with timed(POOL_METRIC_PREFIX + "checkout_wait.async"):
+            return super()._do_get()
+
+
+def _engine_options(url: str, poolclass) -> dict:
+    """Pool options from settings; SQLite (local dev/tests) keeps SQLAlchemy's default pool."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+# Sessions only check out a connection on first use, so get_db is cheap for
+# requests that never touch the database.
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the request path; built lazily so importing this module
+# does not require the asyncpg driver (scripts, migrations, background jobs).
+_async_engine = None
+_AsyncSessionLocal = None
+
+# external user id -> users.id; rows are never renumbered, the TTL only bounds staleness after deletes
+user_id_cache = TTLCache(maxsize=settings.user_cache_max_items, ttl=settings.user_cache_ttl_seconds)
+
 Base = declarative_base()
 
 class User(Base):
@@ -38,13 +84,17 @@ class Chat(Base):
     user = relationship("User", back_populates="chats")
 
 
+# Serves keyset-paginated history: WHERE user_id = ? AND (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC
+Index("idx_chats_user_timestamp_id", Chat.user_id, Chat.timestamp.desc(), Chat.id.desc())
+
+
 class Document(Base):
     __tablename__ = "documents"
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
-    content_hash = Column(String, unique=True)  # To prevent duplicate uploads
+    content_hash = Column(String)  # Unique per user, see uq_documents_user_content_hash
     indexed = Column(Boolean, default=False)
     indexed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -54,6 +104,58 @@ class Document(Base):
     # Relationship with User
     user = relationship("User", backref="documents")
 
+
+# Duplicate uploads are detected per user; identical bytes from different users share one stored file
+Index("uq_documents_user_content_hash", Document.user_id, Document.content_hash, unique=True)
+
+
+class DocumentChunk(Base):
+    """Fingerprint of one indexed chunk: lets re-indexing skip unchanged chunks and delete removed ones."""
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    chunk_hash = Column(String(64), nullable=False)  # sha256 of the chunk text
+    vector_id = Column(String(128), nullable=False, unique=True)
+    chunk_index = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IndexingJob(Base):
+    """Durable document indexing job; claimed by workers under a time-limited lease."""
+    __tablename__ = "indexing_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(16), nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime(timezone=True), server_default=func.now())
+    lease_owner = Column(String(128))
+    lease_expires_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    # Progress of the current attempt, written by the worker (see services/jobs.JobProgress)
+    stage = Column(String(16))  # extracting, embedding, upserting
+    pages_total = Column(Integer)
+    pages_processed = Column(Integer, nullable=False, default=0)
+    chunks_processed = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_unchanged = Column(Integer, nullable=False, default=0)
+    vectors_upserted = Column(Integer, nullable=False, default=0)
+    stage_seconds = Column(Text)  # JSON: {"extracting": 1.2, "embedding": 3.4, "upserting": 0.5}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    document = relationship("Document")
+
+
+# Claim query: WHERE status IN (...) ORDER BY run_after
+Index("idx_indexing_jobs_status_run_after", IndexingJob.status, IndexingJob.run_after)
+
+
 def init_db():
     """Create all tables in the database"""
     Base.metadata.create_all(bind=engine)
@@ -66,16 +168,121 @@ def get_db():
         db.close()
 
 
+def get_async_engine():
+    """Return the shared async engine, creating it on first use."""
+    global _async_engine
+    if _async_engine is None:
+        url = settings.ASYNC_DATABASE_URL
+        _async_engine = create_async_engine(url, **_engine_options(url, TimedAsyncQueuePool))
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Open a new AsyncSession bound to the shared async engine."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_status(pool) -> dict:
+    status = {"class": type(pool).__name__}
+    for attr in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, attr, None)
+        if callable(fn):
+            status[attr] = fn()
+    return status
+
+
+def pool_stats() -> dict:
+    """Current pool occupancy for both engines (the async one only if it has been created)."""
+    return {
+        "sync": _pool_status(engine.pool),
+        "async": _pool_status(_async_engine.pool) if _async_engine is not None else None,
+    }
+
+
+def _insert_user_stmt(dialect_name: str, external_user_id: str):
+    """INSERT ... ON CONFLICT DO NOTHING RETURNING id, or None if the dialect lacks it."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return (
+        insert(User)
+        .values(user_id=external_user_id)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+        .returning(User.id)
+    )
+
+
 def get_or_create_user_by_external_id(db: Session, external_user_id: str) -> int:
     """Return the DB primary key for a given external/frontend user identifier.
 
     If the user does not exist, create it. This centralizes the mapping so
     all services use the DB PK (int) as the canonical user id for Pinecone metadata.
+    Results are cached in-process; creation is an insert-on-conflict so concurrent
+    first requests for the same id resolve to the same row instead of failing.
     """
-    user = db.query(User).filter(User.user_id == external_user_id).first()
-    if not user:
-        user = User(user_id=external_user_id)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    return user.id
+    cached = user_id_cache.get(external_user_id)
+    if cached is not None:
+        return cached
+
+    lookup = select(User.id).where(User.user_id == external_user_id)
+    user_id = db.execute(lookup).scalar_one_or_none()
+    if user_id is None:
+        stmt = _insert_user_stmt(db.get_bind().dialect.name, external_user_id)
+        try:
+            if stmt is not None:
+                user_id = db.execute(stmt).scalar_one_or_none()
+            else:
+                user = User(user_id=external_user_id)
+                db.add(user)
+                db.flush()
+                user_id = user.id
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+        if user_id is None:
+            # Another request created it first
+            user_id = db.execute(lookup).scalar_one()
+
+    user_id_cache.set(external_user_id, user_id)
+    return user_id
+
+
+async def aget_or_create_user_by_external_id(db: AsyncSession, external_user_id: str) -> int:
+    """Async counterpart of `get_or_create_user_by_external_id` for AsyncSession callers."""
+    cached = user_id_cache.get(external_user_id)
+    if cached is not None:
+        return cached
+
+    lookup = select(User.id).where(User.user_id == external_user_id)
+    user_id = (await db.execute(lookup)).scalar_one_or_none()
+    if user_id is None:
+        stmt = _insert_user_stmt(db.get_bind().dialect.name, external_user_id)
+        try:
+            if stmt is not None:
+                user_id = (await db.execute(stmt)).scalar_one_or_none()
+            else:
+                user = User(user_id=external_user_id)
+                db.add(user)
+                await db.flush()
+                user_id = user.id
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+        if user_id is None:
+            user_id = (await db.execute(lookup)).scalar_one()
+
+    user_id_cache.set(external_user_id, user_id)
+    return user_id
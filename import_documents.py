@@ -0,0 +1,109 @@
+# import_documents.py
+"""
+Server-side bulk import of a directory of PDFs.
+
+Usage:
+    python import_documents.py /path/to/pdfs --user-id <external user id> [--recursive] [--wait]
+
+Every PDF is hashed, copied into content-addressed storage and queued for
+indexing exactly like an upload (duplicates are skipped, same-named files are
+re-indexed as new revisions). Indexing itself is done by the job workers
+(`python worker.py` or the API's embedded workers); --wait polls the queued
+jobs and prints progress until they finish.
+"""
+import argparse
+import os
+import sys
+import time
+
+from db.database import SessionLocal, get_or_create_user_by_external_id, init_db
+from logger_config import logger
+from services.ingest import UploadTooLarge, ingest_path
+from services.jobs import job_status, latest_job_for_document
+
+
+def find_pdfs(root: str, recursive: bool):
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(".pdf") and not name.startswith("."):
+                yield os.path.join(dirpath, name)
+        if not recursive:
+            return
+
+
+def wait_for_jobs(document_ids, poll_seconds: float = 5.0) -> dict:
+    pending = set(document_ids)
+    states = {}
+    while pending:
+        db = SessionLocal()
+        try:
+            for document_id in list(pending):
+                job = latest_job_for_document(db, document_id)
+                status = job_status(job) if job is not None else {"state": "failed", "error": "no job"}
+                states[document_id] = status
+                if status["state"] in ("done", "failed"):
+                    pending.discard(document_id)
+        finally:
+            db.close()
+        counts = {}
+        for status in states.values():
+            counts[status["state"]] = counts.get(status["state"], 0) + 1
+        print(f"  {len(document_ids) - len(pending)}/{len(document_ids)} finished {counts}", flush=True)
+        if pending:
+            time.sleep(poll_seconds)
+    return states
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import a directory of PDFs for a user")
+    parser.add_argument("path", help="directory (or single PDF) to import")
+    parser.add_argument("--user-id", required=True, help="external user id (created if missing)")
+    parser.add_argument("--recursive", action="store_true", help="include subdirectories")
+    parser.add_argument("--wait", action="store_true", help="wait for indexing to finish")
+    args = parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    results = {"indexing": 0, "already_exists": 0, "error": 0}
+    queued = []
+    try:
+        user_id = get_or_create_user_by_external_id(db, args.user_id)
+        for path in find_pdfs(args.path, args.recursive):
+            # Relative paths keep same-named files in different folders apart
+            name = os.path.relpath(path, args.path) if os.path.isdir(args.path) else os.path.basename(path)
+            try:
+                result = ingest_path(db, user_id, path, filename=name)
+            except (UploadTooLarge, OSError) as e:
+                db.rollback()
+                results["error"] += 1
+                print(f"error           {name}: {e}")
+                continue
+            except Exception as e:
+                db.rollback()
+                results["error"] += 1
+                logger.exception("Import of %s failed: %s", path, e)
+                print(f"error           {name}: {e}")
+                continue
+            results[result["status"]] += 1
+            if result["job_id"] is not None:
+                queued.append(result["document_id"])
+            print(f"{result['status']:<15} {name}")
+    finally:
+        db.close()
+
+    print(f"Imported: {results}")
+    if args.wait and queued:
+        states = wait_for_jobs(queued)
+        failed = [d for d, s in states.items() if s["state"] == "failed"]
+        for document_id in failed:
+            print(f"failed document {document_id}: {(states[document_id].get('error') or '').splitlines()[:1]}")
+        return 1 if failed or results["error"] else 0
+    return 1 if results["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
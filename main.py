@@ -6,7 +6,12 @@ from config import APP_NAME, DEBUG
 from db.database import init_db
 from routes import health   # <-- new
 from logger_config import logger  # Import the logger
+from services.probes import start_probes, stop_probes
+from services.pdf_extract import shutdown_extraction_pool
+from services.indexing_worker import start_indexing, stop_indexing
+from services.pinecone_client import warm_up
 from fastapi.staticfiles import StaticFiles
+import asyncio
 import os
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -30,6 +35,29 @@ def startup_event():
     init_db()
     logger.info("Database initialized")
 
+
+@app.on_event("startup")
+async def start_background_probes():
+    start_probes()
+
+
+@app.on_event("startup")
+async def start_indexing_workers():
+    start_indexing()
+
+
+@app.on_event("startup")
+async def warm_up_vector_store():
+    # In the background: a slow or unreachable Pinecone must not hold up startup
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_probes()
+    await stop_indexing()
+    shutdown_extraction_pool()
+
 # Include routers
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(documents.router, prefix="/documents", tags=["documents"])
@@ -2,6 +2,19 @@
 from sqlalchemy import create_engine, text, inspect
 from config import DATABASE_URL
 
+# (column, definition) added to indexing_jobs for job progress reporting
+INDEXING_JOB_PROGRESS_COLUMNS = [
+    ("stage", "VARCHAR(16)"),
+    ("pages_total", "INTEGER"),
+    ("pages_processed", "INTEGER NOT NULL DEFAULT 0"),
+    ("chunks_processed", "INTEGER NOT NULL DEFAULT 0"),
+    ("chunks_embedded", "INTEGER NOT NULL DEFAULT 0"),
+    ("chunks_unchanged", "INTEGER NOT NULL DEFAULT 0"),
+    ("vectors_upserted", "INTEGER NOT NULL DEFAULT 0"),
+    ("stage_seconds", "TEXT"),
+    ("updated_at", "TIMESTAMP WITH TIME ZONE DEFAULT NOW()"),
+]
+
 def run_migrations():
     engine = create_engine(DATABASE_URL)
     inspector = inspect(engine)
@@ -33,7 +46,7 @@ def run_migrations():
                 id SERIAL PRIMARY KEY,
                 filename VARCHAR(255) NOT NULL,
                 file_path VARCHAR(1024) NOT NULL,
-                content_hash VARCHAR(64) UNIQUE,
+                content_hash VARCHAR(64),
                 indexed BOOLEAN DEFAULT FALSE,
                 indexed_at TIMESTAMP WITH TIME ZONE,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
@@ -53,16 +66,74 @@ def run_migrations():
                 print("Added user_id column to documents table")
             else:
                 print("user_id column already exists in documents table")
+
+        # Duplicate detection is per user: drop the global content_hash uniqueness of earlier
+        # schemas (UNIQUE(user_id, content_hash) is created with the other indexes below)
+        conn.execute(text("ALTER TABLE documents DROP CONSTRAINT IF EXISTS documents_content_hash_key"))
+        
+        # Create per-chunk fingerprint table (incremental re-indexing)
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                id SERIAL PRIMARY KEY,
+                document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                chunk_hash VARCHAR(64) NOT NULL,
+                vector_id VARCHAR(128) UNIQUE NOT NULL,
+                chunk_index INTEGER,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            )
+        """))
+        
+        # Create indexing job queue table
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS indexing_jobs (
+                id SERIAL PRIMARY KEY,
+                document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                status VARCHAR(16) NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                lease_owner VARCHAR(128),
+                lease_expires_at TIMESTAMP WITH TIME ZONE,
+                last_error TEXT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                started_at TIMESTAMP WITH TIME ZONE,
+                finished_at TIMESTAMP WITH TIME ZONE
+            )
+        """))
+
+        # Job progress columns, added to tables created before them
+        job_columns = {
+            row[0] for row in conn.execute(text(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'indexing_jobs'"
+            ))
+        }
+        for column, definition in INDEXING_JOB_PROGRESS_COLUMNS:
+            if column not in job_columns:
+                conn.execute(text(f"ALTER TABLE indexing_jobs ADD COLUMN {column} {definition}"))
+                print(f"Added {column} column to indexing_jobs table")
         
         # Create indexes
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)"))
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats(user_id)"))
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_chats_timestamp ON chats(timestamp)"))
+        # Composite index for keyset-paginated /chat/history
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_chats_user_timestamp_id ON chats(user_id, timestamp DESC, id DESC)"
+        ))
         conn.execute(text("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_document_chunks_document_id ON document_chunks(document_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_indexing_jobs_document_id ON indexing_jobs(document_id)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_indexing_jobs_status_run_after ON indexing_jobs(status, run_after)"
+        ))
         
         # Only create this index if the user_id column exists
         if inspector.has_table("documents") and "user_id" in [column['name'] for column in inspector.get_columns("documents")]:
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_documents_user_id ON documents(user_id)"))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_documents_user_content_hash ON documents(user_id, content_hash)"
+            ))
         
         conn.commit()
     
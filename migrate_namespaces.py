@@ -0,0 +1,96 @@
+# migrate_namespaces.py
+"""
+Move vectors from the shared namespace into per-user namespaces.
+
+Usage:
+    python migrate_namespaces.py [--batch-size N] [--dry-run] [--keep-source]
+
+Ids are listed page by page; each batch is fetched with its values and
+metadata, upserted into "<VECTOR_NAMESPACE_PREFIX><user_id>" and then deleted
+from the source, so the tool can be stopped and re-run at any point. Vectors
+without a user_id in their metadata are left where they are.
+
+Listing ids needs a serverless index; on pod-based indexes the document
+vector ids recorded in document_chunks are used instead (transcript vectors
+cannot be enumerated there and stay in the shared namespace).
+
+Afterwards set VECTOR_NAMESPACE_MODE=user and restart the API and workers;
+re-run once more to pick up anything written in between.
+"""
+import argparse
+import sys
+from typing import Dict, Iterator, List, Optional
+
+from db.database import DocumentChunk, SessionLocal
+from logger_config import logger
+from services.pinecone_service import per_user_namespace, vector_store
+from services.upsert_pipeline import upsert_in_batches
+
+
+def source_id_pages(namespace: Optional[str], page_size: int) -> Iterator[List[str]]:
+    try:
+        yield from vector_store.list_ids(namespace=namespace)
+        return
+    except Exception as e:
+        logger.warning(f"Could not list vector ids ({e}); falling back to document chunk ids from the database")
+    db = SessionLocal()
+    try:
+        page = []
+        for (vector_id,) in db.query(DocumentChunk.vector_id).order_by(DocumentChunk.id).yield_per(page_size):
+            page.append(vector_id)
+            if len(page) >= page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+    finally:
+        db.close()
+
+
+def migrate_batch(ids: List[str], source: Optional[str], dry_run: bool, keep_source: bool) -> Dict[str, int]:
+    fetched = vector_store.fetch(ids, namespace=source)
+    by_user: Dict[int, list] = {}
+    skipped = 0
+    for vector in fetched.values():
+        user_id = (vector.get("metadata") or {}).get("user_id")
+        if user_id is None:
+            skipped += 1
+            continue
+        by_user.setdefault(int(user_id), []).append(
+            {"id": vector["id"], "values": vector["values"], "metadata": vector["metadata"]}
+        )
+    moved = sum(len(vectors) for vectors in by_user.values())
+    if not dry_run:
+        for user_id, vectors in by_user.items():
+            upsert_in_batches(vector_store, vectors, namespace=per_user_namespace(user_id))
+        if not keep_source:
+            # Only after every target upsert succeeded (upsert_in_batches raises otherwise)
+            moved_ids = [v["id"] for vectors in by_user.values() for v in vectors]
+            if moved_ids:
+                vector_store.delete(ids=moved_ids, namespace=source)
+    return {"moved": moved, "skipped": skipped, "missing": len(ids) - len(fetched), "users": len(by_user)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Move vectors from the shared namespace into per-user namespaces")
+    parser.add_argument("--batch-size", type=int, default=100, help="vectors fetched/moved per batch")
+    parser.add_argument("--source-namespace", default=None, help="namespace to migrate from (default: the default namespace)")
+    parser.add_argument("--dry-run", action="store_true", help="count what would move without writing")
+    parser.add_argument("--keep-source", action="store_true", help="copy instead of move")
+    args = parser.parse_args(argv)
+
+    batch_size = max(1, args.batch_size)
+    totals = {"moved": 0, "skipped": 0, "missing": 0}
+    for page in source_id_pages(args.source_namespace, batch_size):
+        for i in range(0, len(page), batch_size):
+            result = migrate_batch(page[i:i + batch_size], args.source_namespace, args.dry_run, args.keep_source)
+            for key in totals:
+                totals[key] += result[key]
+            print(f"{'would move' if args.dry_run else 'moved'} {totals['moved']} vectors "
+                  f"(skipped {totals['skipped']} without user_id, {totals['missing']} not found)", flush=True)
+    print(f"Done: {totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
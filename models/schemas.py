@@ -8,6 +8,9 @@ from datetime import datetime, timezone
 class DocumentUpload(BaseModel):
     filename: str
     status: str
+    document_id: Optional[int] = None
+    # Follow progress at /documents/status/{document_id} or the /documents/ws/status/{document_id} WebSocket
+    job_id: Optional[int] = None
 
 class ChatRequest(BaseModel):
     user_id: str
@@ -28,4 +31,6 @@ class ChatResponse(BaseModel):
 
 class ChatHistoryResponse(BaseModel):
     user_id: str
-    messages: List[Dict[str, Any]]
\ No newline at end of file
+    messages: List[Dict[str, Any]]
+    # Pass as ?before= to fetch the next (older) page; None when there are no more messages
+    next_cursor: Optional[str] = None
\ No newline at end of file
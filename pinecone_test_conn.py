@@ -6,7 +6,7 @@ Usage:
     python scripts/pinecone_crud_test_with_create.py
 
 Notes:
- - It tries to reuse your `services.pinecone_service.index` and `config.settings`.
+ - It tries to reuse the shared index from `services.pinecone_client` and `config.settings`.
  - If those imports fail it will look for env vars:
      PINECONE_API_KEY, PINECONE_INDEX_NAME
  - Default dimension/metric are set to 1024 / cosine to match your screenshot.
@@ -27,10 +27,11 @@ logger = logging.getLogger("pinecone_crud_test")
 index = None
 settings = None
 try:
-    from services.pinecone_service import index as imported_index, get_embedding as imported_get_embedding
-    index = imported_index
+    from services.pinecone_client import get_index
+    from services.pinecone_service import get_embedding as imported_get_embedding
+    index = get_index()
     get_embedding = imported_get_embedding
-    logger.info("Using index & get_embedding from services.pinecone_service")
+    logger.info("Using the shared index from services.pinecone_client & get_embedding from services.pinecone_service")
 except Exception:
     # If not available, we'll build Pinecone client from config or env vars below
     logger.info("services.pinecone_service import failed; will try to create/check index from Pinecone client.")
@@ -79,7 +80,13 @@ def ensure_index_exists(index_name: str, api_key: str, dimension: int = 1024, me
         logger.error("Unable to import Pinecone client library: %s", e)
         raise
 
-    pc = Pinecone(api_key=api_key)
+    try:
+        # Reuse the process-wide client (connection pool, timeouts) when the keys match
+        from services.pinecone_client import get_client
+        from config import settings as app_settings
+        pc = get_client() if app_settings.pinecone_api_key == api_key else Pinecone(api_key=api_key)
+    except Exception:
+        pc = Pinecone(api_key=api_key)
     logger.info("Initialized Pinecone client")
 
     # Try to instantiate index object
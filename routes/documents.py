@@ -1,23 +1,57 @@
 # routes/documents.py
+import asyncio
 import hashlib
 import os
+import zipfile
+from typing import List, Optional
 
-from fastapi import (APIRouter, BackgroundTasks, Depends, File, Form,
-                     HTTPException, UploadFile)
+from fastapi import (APIRouter, Depends, File, Form, HTTPException, Query,
+                     UploadFile, WebSocket, WebSocketDisconnect)
 from sqlalchemy.orm import Session
 
 from config import settings
-from db.database import Document, SessionLocal, User, get_db
+from db.database import Document, IndexingJob, SessionLocal, User, get_db
 from logger_config import logger
 from models.schemas import DocumentUpload
-from services.pinecone_client import describe_index_stats
-from services.pinecone_service import index_document
+from services.ingest import (UploadTooLarge, iter_zip_pdfs, new_temp_file,
+                             register_document)
+from services.jobs import job_status, latest_job_for_document, list_jobs
+from services.pinecone_service import describe_index_stats
 
 router = APIRouter()
 
+
+async def _stream_to_temp(file: UploadFile, max_bytes: Optional[int] = None):
+    """
+    Copy the upload to a temp file in fixed-size chunks, hashing as it goes.
+    Returns (temp_path, sha256 hex, size). Raises 413 past `max_bytes` (default settings.upload_max_bytes).
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=str(UploadTooLarge(max_bytes)))
+
+    fd, tmp_path = new_temp_file()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(settings.upload_chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=str(UploadTooLarge(max_bytes)))
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
 @router.post("/upload", response_model=DocumentUpload)
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: str = Form(...),
     db: Session = Depends(get_db)
@@ -39,56 +73,88 @@ async def upload_document(
         logger.warning(f"User not found: {user_id}")
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Calculate file hash to prevent duplicates
-    file_content = await file.read()
-    file_hash = hashlib.sha256(file_content).hexdigest()
-    
-    # Check if document already exists for this user
-    existing_doc = db.query(Document).filter(
-        Document.content_hash == file_hash,
-        Document.user_id == user.id
-    ).first()
-    if existing_doc:
-        logger.info(f"Document already exists for user {user_id}: {existing_doc.filename}")
-        return DocumentUpload(
-            filename=existing_doc.filename,
-            status="already_exists"
-        )
-    
-    # Save file
-    os.makedirs(settings.assets_dir, exist_ok=True)
-    file_path = os.path.join(settings.assets_dir, file.filename)
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(file_content)
-    
-    logger.info(f"Saved file to {file_path}")
-    
-    # Create document record with user_id
-    document = Document(
-        filename=file.filename,
-        file_path=file_path,
-        content_hash=file_hash,
-        user_id=user.id
-    )
-    db.add(document)
-    db.commit()
-    db.refresh(document)
-    
-    logger.info(f"Created document record with ID: {document.id}")
-    
-    # Create a new session for the background task
-    new_db = SessionLocal()
-    
-    # Index document in background
-    background_tasks.add_task(index_document, file_path, document.id, user.id, new_db)
-    
-    logger.info(f"Started background indexing task for document {document.id}")
-    
-    return DocumentUpload(
-        filename=file.filename,
-        status="indexing"
-    )
+    # Stream to disk while hashing; memory use stays at one chunk regardless of file size
+    tmp_path, file_hash, file_size = await _stream_to_temp(file)
+    
+    logger.info(f"Received {file_size} bytes for {file.filename}")
+    
+    # Dedup, store content-addressed, create/update the Document and queue indexing
+    result = register_document(db, user.id, file.filename, tmp_path, file_hash)
+    return DocumentUpload(**result)
+
+
+def _register_safely(db: Session, user_id: int, filename: str, tmp_path: str, file_hash: str) -> dict:
+    """register_document for bulk intake: one bad file is reported instead of failing the whole request."""
+    try:
+        return register_document(db, user_id, filename, tmp_path, file_hash)
+    except Exception as e:
+        db.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.error(f"Bulk upload: could not register {filename}: {e}")
+        return {"filename": filename, "status": "error", "detail": str(e)}
+
+
+def _ingest_zip(db: Session, user_id: int, zip_path: str) -> List[dict]:
+    results = []
+    for entry in iter_zip_pdfs(zip_path):
+        if "error" in entry:
+            results.append({"filename": entry["filename"], "status": "error", "detail": entry["error"]})
+            continue
+        results.append(_register_safely(db, user_id, entry["filename"], entry["tmp_path"], entry["hash"]))
+    return results
+
+
+@router.post("/bulk-upload")
+async def bulk_upload_documents(
+    files: List[UploadFile] = File(...),
+    user_id: str = Form(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many PDFs at once, as several files and/or zip archives of PDFs.
+    Every PDF is stored and queued for indexing; the response lists the outcome per file.
+    """
+    logger.info(f"Bulk upload of {len(files)} file(s) requested by user {user_id}")
+    
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if not user:
+        logger.warning(f"User not found: {user_id}")
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    results = []
+    for file in files:
+        name = file.filename or ""
+        lower = name.lower()
+        if lower.endswith(".zip"):
+            try:
+                tmp_path, _, size = await _stream_to_temp(file, max_bytes=settings.bulk_upload_max_bytes)
+            except HTTPException as e:
+                results.append({"filename": name, "status": "error", "detail": e.detail})
+                continue
+            try:
+                logger.info(f"Unpacking archive {name} ({size} bytes)")
+                results.extend(await asyncio.to_thread(_ingest_zip, db, user.id, tmp_path))
+            except zipfile.BadZipFile as e:
+                results.append({"filename": name, "status": "error", "detail": f"Invalid zip archive: {e}"})
+            finally:
+                os.remove(tmp_path)
+        elif lower.endswith(".pdf"):
+            try:
+                tmp_path, file_hash, _ = await _stream_to_temp(file)
+            except HTTPException as e:
+                results.append({"filename": name, "status": "error", "detail": e.detail})
+                continue
+            results.append(_register_safely(db, user.id, name, tmp_path, file_hash))
+        else:
+            results.append({"filename": name, "status": "error", "detail": "Only PDF files and zip archives of PDFs are supported"})
+    
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    logger.info(f"Bulk upload for user {user_id} finished: {counts}")
+    return {"user_id": user_id, "counts": counts, "results": results}
+
 
 @router.get("/list/{user_id}")
 async def list_documents(user_id: str, db: Session = Depends(get_db)):
@@ -103,6 +169,15 @@ async def list_documents(user_id: str, db: Session = Depends(get_db)):
     documents = db.query(Document).filter(Document.user_id == user.id).all()
     logger.info(f"Found {len(documents)} documents for user {user_id}")
     
+    # Latest job state per document (queued/extracting/.../done/failed)
+    states = {}
+    if documents:
+        jobs = db.query(IndexingJob).filter(
+            IndexingJob.document_id.in_([doc.id for doc in documents])
+        ).order_by(IndexingJob.id).all()
+        for job in jobs:
+            states[job.document_id] = job_status(job)["state"]
+    
     return {
         "user_id": user_id,
         "documents": [
@@ -110,6 +185,7 @@ async def list_documents(user_id: str, db: Session = Depends(get_db)):
                 "id": doc.id,
                 "filename": doc.filename,
                 "indexed": doc.indexed,
+                "indexing_state": states.get(doc.id),
                 "indexed_at": doc.indexed_at,
                 "created_at": doc.created_at
             }
@@ -119,6 +195,63 @@ async def list_documents(user_id: str, db: Session = Depends(get_db)):
 
 
 
+@router.get("/status/{document_id}")
+async def document_status(document_id: int, db: Session = Depends(get_db)):
+    """Indexing state of a document's latest job: stage, page/chunk counters, per-stage seconds and error detail."""
+    job = latest_job_for_document(db, document_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No indexing job for this document")
+    return job_status(job)
+
+
+@router.get("/jobs")
+async def indexing_jobs(
+    status: Optional[str] = Query(None, description="queued, running, done or failed"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Recent indexing jobs, newest first; running jobs with an expired lease are flagged as stalled."""
+    return {"jobs": [job_status(job) for job in list_jobs(db, status=status, limit=limit)]}
+
+
+def _load_status(document_id: int):
+    db = SessionLocal()
+    try:
+        job = latest_job_for_document(db, document_id)
+        return job_status(job) if job is not None else None
+    finally:
+        db.close()
+
+
+@router.websocket("/ws/status/{document_id}")
+async def document_status_ws(websocket: WebSocket, document_id: int):
+    """Push the document's job status whenever it changes; closes once the job is done or failed."""
+    await websocket.accept()
+    token = websocket.query_params.get("token") or websocket.headers.get("authorization")
+    if settings.ws_auth_token and (not token or token.replace("Bearer ", "") != settings.ws_auth_token):
+        logger.warning("Status WebSocket rejected due to missing/invalid token")
+        await websocket.close(code=4401)
+        return
+    last = None
+    try:
+        while True:
+            status = await asyncio.to_thread(_load_status, document_id)
+            if status is None:
+                await websocket.send_json({"document_id": document_id, "state": "not_found"})
+                break
+            # elapsed/queued seconds tick on their own; push only real progress changes
+            fingerprint = (status["updated_at"], status["state"], status["attempts"])
+            if fingerprint != last:
+                await websocket.send_json(status)
+                last = fingerprint
+            if status["state"] in ("done", "failed"):
+                break
+            await asyncio.sleep(settings.indexing_status_push_seconds)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Status WebSocket for document {document_id} disconnected")
+
+
 @router.get("/test-embedding")
 async def test_embedding():
     """Test embedding generation with a sample text."""
@@ -149,7 +282,7 @@ async def test_embedding():
 
 @router.get("/pinecone-stats")
 async def get_pinecone_stats():
-    """Get statistics about the Pinecone index."""
+    """Get statistics about the vector index (Pinecone or local backend)."""
     logger.info("Getting Pinecone index statistics")
     
     try:
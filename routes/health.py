@@ -67,9 +67,10 @@ async def health(
                     "total_vector_count": total
                 }
             except Exception:
-                # fallback: try to use services.pinecone_service.index.describe_index_stats()
-                from services.pinecone_service import index as pc_index
-                stats = pc_index.describe_index_stats()
+                # fallback: ask the configured vector store backend (also covers the local backend)
+                from services.pinecone_service import describe_index_stats as store_stats
+                from config import settings
+                stats = store_stats()
                 elapsed = perf_counter() - start
                 # try to normalize
                 total = None
@@ -77,7 +78,7 @@ async def health(
                     total = stats.get("total_vector_count")
                 results["components"]["pinecone"] = {
                     "ok": True,
-                    "message": "Pinecone reachable (fallback)",
+                    "message": f"Vector store reachable ({settings.vector_store_backend} backend, fallback)",
                     "latency_s": round(elapsed, 3),
                     "total_vector_count": total
                 }
@@ -124,3 +125,37 @@ async def health(
     # Final status: if any component false -> 503
     status_code = 200 if results["status"] == "ok" else 503
     return results
+
+
+@router.get("/health/probes")
+async def probes() -> Dict[str, Any]:
+    """Synthetic Pinecone probe results and per-operation latency histograms."""
+    from services.probes import probe_status
+    return probe_status()
+
+
+@router.get("/health/caches")
+async def caches() -> Dict[str, Any]:
+    """Hit/miss counters and sizes for the in-process caches."""
+    from services.embedding_cache import get_embedding_cache
+    from services.retrieval_cache import retrieval_cache
+    from services.semantic_cache import semantic_cache
+    from db.database import user_id_cache
+    embedding_cache = get_embedding_cache()
+    return {
+        "embedding": embedding_cache.stats() if embedding_cache is not None else {"enabled": False},
+        "semantic_response": semantic_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "user_ids": user_id_cache.stats(),
+    }
+
+
+@router.get("/health/db")
+async def db_pool() -> Dict[str, Any]:
+    """Connection pool occupancy and checkout wait-time histograms."""
+    from db.database import POOL_METRIC_PREFIX, pool_stats
+    from services.metrics import snapshot
+    return {
+        "pools": pool_stats(),
+        "checkout_wait": {name[len(POOL_METRIC_PREFIX):]: h for name, h in snapshot(POOL_METRIC_PREFIX).items()},
+    }
@@ -1,4 +1,5 @@
 # routes/voice.py
+import asyncio
 import os
 import urllib.parse
 import uuid
@@ -6,16 +7,16 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, WebSocket, WebSocketDisconnect, BackgroundTasks
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
-from db.database import Chat, User, get_db, get_or_create_user_by_external_id
+from db.database import Chat, get_async_db, aget_or_create_user_by_external_id
 from logger_config import logger
 from models.schemas import ChatResponse
-from services.llm import generate_response
-from services.pinecone_service import retrieve_context, index_transcript
-from services.stt import transcribe_audio
-from services.tts import generate_speech
+from services.answer import aanswer
+from services.pinecone_service import index_transcript
+from services.stt import atranscribe_audio
+from services.tts import agenerate_speech
 from services.streaming import websocket_stream
 
 
@@ -29,7 +30,7 @@ async def upload_voice(
     user_id: str = Form(...),
     generate_audio: bool = Form(False),
     background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     logger.info(f"Voice upload requested by user {user_id}, generate_audio: {generate_audio}")
 
@@ -48,12 +49,15 @@ async def upload_voice(
     unique_filename = f"{uuid.uuid4()}.{file_extension}"
     file_path = os.path.join(audio_dir, unique_filename)
 
-    try:
-        contents = await file.read()
+    def _write_file(contents: bytes):
         with open(file_path, "wb") as f:
             f.write(contents)
             f.flush()
             os.fsync(f.fileno())
+
+    try:
+        contents = await file.read()
+        await asyncio.to_thread(_write_file, contents)
         logger.info(f"Saved audio file to {file_path}")
 
         if os.path.getsize(file_path) == 0:
@@ -65,14 +69,14 @@ async def upload_voice(
     # Transcribe audio
     try:
         logger.info("Starting audio transcription")
-        transcription = transcribe_audio(file_path)
+        transcription = await atranscribe_audio(file_path)
         logger.info(f"Transcription completed: {transcription}")
     except Exception as e:
         logger.error(f"Error transcribing audio: {e}")
         raise HTTPException(status_code=500, detail="Transcription failed")
 
     # Get or create user
-    db_user_id = get_or_create_user_by_external_id(db, user_id)
+    db_user_id = await aget_or_create_user_by_external_id(db, user_id)
     logger.info(f"Resolved external user_id={user_id} to db_id={db_user_id}")
 
     # Store transcript immediately in DB as a Chat entry (response will be filled later)
@@ -83,8 +87,8 @@ async def upload_voice(
         timestamp=datetime.utcnow()
     )
     db.add(chat_entry)
-    db.commit()
-    db.refresh(chat_entry)
+    await db.commit()
+    await db.refresh(chat_entry)
     logger.info(f"Stored transcript as chat id={chat_entry.id} for user db_id={db_user_id}")
 
     # Schedule background indexing of the transcript (so embeddings are created asynchronously)
@@ -94,27 +98,22 @@ async def upload_voice(
             logger.info("Scheduled background indexing task for chat id=%s", chat_entry.id)
         else:
             # if BackgroundTasks wasn't provided, try to index inline (best-effort)
-            index_transcript(db_user_id, transcription, chat_entry.id)
+            await asyncio.to_thread(index_transcript, db_user_id, transcription, chat_entry.id)
             logger.info("Indexed transcript inline for chat id=%s", chat_entry.id)
     except Exception as e:
         logger.error(f"Failed to schedule/index transcript: {e}")
 
-    # Retrieve context using canonical DB id
-    context = retrieve_context(transcription, db_user_id)
-    print("Final output context in voice.py --------> ", context)
-
-    # Generate LLM response
+    # Retrieve context using canonical DB id and generate the LLM response (or reuse a cached answer)
     logger.info("Generating LLM response  - before function execution in - voice.py")
-    response_text = generate_response(transcription, context)
-    print("response_text---> ", response_text)
+    response_text = await aanswer(transcription, db_user_id)
 
     # Update existing chat entry with response
     try:
         chat_entry.response = response_text
         chat_entry.timestamp = datetime.utcnow()
         db.add(chat_entry)
-        db.commit()
-        db.refresh(chat_entry)
+        await db.commit()
+        await db.refresh(chat_entry)
         logger.info(f"Updated chat entry id={chat_entry.id} with response")
     except Exception:
         logger.exception("Failed to update chat_entry with response")
@@ -127,7 +126,7 @@ async def upload_voice(
             audio_response_path = os.path.join(audio_dir, response_filename)
             logger.info(f"Generating audio response to {audio_response_path}")
 
-            generate_speech(response_text, audio_response_path)
+            await agenerate_speech(response_text, audio_response_path)
 
             if os.path.exists(audio_response_path):
                 rel_path = os.path.relpath(audio_response_path, settings.assets_dir).replace("\\", "/")
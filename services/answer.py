@@ -0,0 +1,23 @@
+# services/answer.py
+from services.llm import agenerate_response, is_fallback_response
+from services.pinecone_service import aget_embedding, aretrieve_context
+from services.semantic_cache import semantic_cache
+
+
+async def aanswer(user_message: str, user_id: int) -> str:
+    """
+    Retrieve context for `user_id` and generate a reply, served from the semantic
+    response cache when a near-identical question was answered before.
+    """
+    query_embedding = await aget_embedding(user_message)
+    cached = semantic_cache.lookup(user_id, query_embedding)
+    if cached is not None:
+        return cached
+
+    generation = semantic_cache.generation(user_id)
+    context = await aretrieve_context(user_message, user_id, query_embedding=query_embedding)
+
+    response_text = await agenerate_response(user_message, context)
+    if not is_fallback_response(response_text):
+        semantic_cache.store(user_id, query_embedding, response_text, generation)
+    return response_text
@@ -0,0 +1,103 @@
+# services/chunking.py
+"""
+Token-bounded text chunking for embedding.
+
+intfloat/e5-large-v2 reads at most 512 tokens; anything past that is silently
+truncated. Text is split into sentences, packed greedily into chunks of at most
+CHUNK_MAX_TOKENS (counted with the conservative `estimate_tokens`), and each
+new chunk starts with the trailing sentences of the previous one, up to
+CHUNK_OVERLAP_TOKENS, so a fact straddling a boundary is embedded whole at
+least once. Sentences longer than a chunk are split on word boundaries.
+"""
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from config import settings
+from services.tokens import estimate_tokens
+
+# Sentence ends (., !, ? and their CJK forms, optionally followed by closing quotes/brackets) or blank lines
+_SENTENCE_SPLIT_RE = re.compile(r"(?:(?<=[.!?。！？])|(?<=[.!?。！？][\"'”’)\]]))\s+|\n\s*\n")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into whitespace-normalized sentences; single line breaks are treated as spaces."""
+    sentences = []
+    for part in _SENTENCE_SPLIT_RE.split(text or ""):
+        part = _WHITESPACE_RE.sub(" ", part).strip()
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+def _split_long(sentence: str, max_tokens: int) -> List[Tuple[str, int]]:
+    """Break one oversized sentence into word-aligned pieces of at most max_tokens."""
+    pieces, words, count = [], [], 0
+    for word in sentence.split(" "):
+        tokens = estimate_tokens(word)
+        if tokens > max_tokens:
+            # A single run of characters with no spaces (URLs, base64, tables flattened by extraction)
+            step = max(1, len(word) * max_tokens // tokens)
+            for i in range(0, len(word), step):
+                segment = word[i:i + step]
+                pieces.append((segment, estimate_tokens(segment)))
+            continue
+        if words and count + tokens > max_tokens:
+            pieces.append((" ".join(words), count))
+            words, count = [], 0
+        words.append(word)
+        count += tokens
+    if words:
+        pieces.append((" ".join(words), count))
+    return pieces
+
+
+def chunk_pages(
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Iterator[Tuple[str, int, int]]:
+    """
+    Chunk a stream of (page_number, text) and yield (chunk_text, first_page, last_page)
+    as soon as each chunk is full, so callers can embed while pages are still arriving.
+    Chunks may span pages; page breaks count as paragraph breaks.
+    """
+    max_tokens = max(1, max_tokens or settings.chunk_max_tokens)
+    overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+
+    window: List[Tuple[str, int, int]] = []  # (sentence, tokens, page)
+    window_tokens = 0
+    has_new = False  # window holds more than the overlap carried from the previous chunk
+
+    def emit():
+        return " ".join(s for s, _, _ in window), window[0][2], window[-1][2]
+
+    for page_number, text in pages:
+        for sentence in split_sentences(text):
+            tokens = estimate_tokens(sentence)
+            parts = _split_long(sentence, max_tokens) if tokens > max_tokens else [(sentence, tokens)]
+            for part, part_tokens in parts:
+                if window and window_tokens + part_tokens > max_tokens:
+                    if has_new:
+                        yield emit()
+                    # Carry trailing sentences forward as overlap
+                    carried, carried_tokens = [], 0
+                    for item in reversed(window):
+                        if carried_tokens + item[1] > overlap_tokens or carried_tokens + item[1] + part_tokens > max_tokens:
+                            break
+                        carried.insert(0, item)
+                        carried_tokens += item[1]
+                    window, window_tokens = carried, carried_tokens
+                    has_new = False
+                window.append((part, part_tokens, page_number))
+                window_tokens += part_tokens
+                has_new = True
+
+    if window and has_new:
+        yield emit()
+
+
+def chunk_text(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> List[str]:
+    """Chunk a single piece of text (e.g. a transcript)."""
+    return [chunk for chunk, _, _ in chunk_pages([(0, text)], max_tokens, overlap_tokens)]
@@ -0,0 +1,113 @@
+# services/context_builder.py
+"""
+Prompt context assembly from retrieval matches.
+
+  1. relevance  - matches below CONTEXT_MIN_SCORE cosine similarity are dropped,
+                  unless they are BM25 (lexical) hits containing at least
+                  CONTEXT_LEXICAL_MIN_COVERAGE of the query's content terms
+  2. diversity  - maximal marginal relevance picks chunks that are relevant but
+                  unlike the ones already picked; near-duplicates (overlapping
+                  chunks, the same passage in two documents) are dropped
+  3. budget     - chunks are packed best first up to CONTEXT_MAX_TOKENS
+
+An empty string means nothing was relevant, and the prompt goes out without
+a context section.
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import settings
+from services.tokens import estimate_tokens
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+CHUNK_SEPARATOR = "\n\n"
+
+
+def match_text(match: Dict[str, Any]) -> Optional[str]:
+    meta = match.get("metadata") or {}
+    if not isinstance(meta, dict):
+        return getattr(meta, "text", None)
+    return meta.get("text") or meta.get("original_text") or meta.get("content")
+
+
+def is_relevant(match: Dict[str, Any], min_score: float, min_coverage: float) -> bool:
+    # Fused (hybrid) matches carry the dense cosine as "similarity"; plain dense matches as "score"
+    similarity = match["similarity"] if "similarity" in match else match.get("score")
+    if similarity is not None and similarity >= min_score:
+        return True
+    if match.get("lexical"):
+        # Exact terms the embedding misses (identifiers, names), but not a single incidental shared word
+        return (match.get("coverage") or 0.0) >= min_coverage
+    return similarity is None
+
+
+def _words(text: str) -> frozenset:
+    return frozenset(w.lower() for w in _WORD_RE.findall(text))
+
+
+def _overlap(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two word sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def build_context(
+    matches: Sequence[Dict[str, Any]],
+    max_chunks: Optional[int] = None,
+    min_score: Optional[float] = None,
+    min_coverage: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+    duplicate_threshold: Optional[float] = None,
+) -> str:
+    """
+    Build the context string from ranked matches ({"id", "score", "metadata"}, best first).
+    Returns "" when no match clears the relevance threshold.
+    """
+    min_score = settings.context_min_score if min_score is None else min_score
+    min_coverage = settings.context_lexical_min_coverage if min_coverage is None else min_coverage
+    max_tokens = settings.context_max_tokens if max_tokens is None else max_tokens
+    mmr_lambda = settings.context_mmr_lambda if mmr_lambda is None else mmr_lambda
+    duplicate_threshold = settings.context_duplicate_threshold if duplicate_threshold is None else duplicate_threshold
+
+    candidates: List[Dict[str, Any]] = []
+    seen_texts = set()
+    for match in matches:
+        text = match_text(match)
+        if not text or text in seen_texts or not is_relevant(match, min_score, min_coverage):
+            continue
+        seen_texts.add(text)
+        candidates.append({"text": text, "score": match.get("score") or 0.0, "words": _words(text)})
+    if not candidates:
+        return ""
+
+    # Min-max normalized so relevance and redundancy are on the same 0..1 scale (cosine and RRF scores are not)
+    high = max(c["score"] for c in candidates)
+    low = min(c["score"] for c in candidates)
+    for c in candidates:
+        c["relevance"] = (c["score"] - low) / (high - low) if high > low else 1.0
+
+    selected: List[Dict[str, Any]] = []
+    used_tokens = 0
+    while candidates and (not max_chunks or len(selected) < max_chunks):
+        best, best_value = None, None
+        for c in list(candidates):
+            redundancy = max((_overlap(c["words"], s["words"]) for s in selected), default=0.0)
+            if redundancy >= duplicate_threshold:
+                candidates.remove(c)
+                continue
+            value = mmr_lambda * c["relevance"] - (1 - mmr_lambda) * redundancy
+            if best_value is None or value > best_value:
+                best, best_value = c, value
+        if best is None:
+            break
+        candidates.remove(best)
+        tokens = estimate_tokens(best["text"])
+        if max_tokens and used_tokens + tokens > max_tokens:
+            # Too big for what is left; a smaller, less relevant chunk may still fit
+            continue
+        selected.append(best)
+        used_tokens += tokens
+    return CHUNK_SEPARATOR.join(c["text"] for c in selected)
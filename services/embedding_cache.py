@@ -0,0 +1,176 @@
+# services/embedding_cache.py
+"""
+Two-tier embedding cache.
+
+Tier 1 is an in-process LRU; tier 2 is a content-addressed SQLite store keyed by
+(model, sha256(text)) holding compact float16/float32 blobs. The store is bounded
+by entry count (least recently used rows are pruned) and by age (TTL).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+from logger_config import logger
+from services.cache import TTLCache
+
+# Prune the persistent store once every this many writes
+PRUNE_EVERY = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        path: str,
+        memory_items: int = 4096,
+        max_entries: int = 200000,
+        ttl_seconds: int = 30 * 24 * 3600,
+        dtype: str = "float16",
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dtype = np.dtype(dtype)
+        self.memory = TTLCache(maxsize=memory_items)
+        self.disk_hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dtype TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings(accessed_at)")
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, text_hash(text))
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached.tolist()
+
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT dtype, vector, created_at FROM embeddings WHERE model = ? AND text_hash = ?",
+                    key,
+                ).fetchone()
+                if row is not None and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", key)
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                self._conn.execute(
+                    "UPDATE embeddings SET accessed_at = ? WHERE model = ? AND text_hash = ?",
+                    (now, *key),
+                )
+                self.disk_hits += 1
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache read failed: %s", e)
+            return None
+
+        vector = np.frombuffer(row[1], dtype=np.dtype(row[0])).astype(np.float32)
+        self.memory.set(key, vector)
+        return vector.tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]) -> None:
+        key = (model, text_hash(text))
+        vector = np.asarray(embedding, dtype=np.float32)
+        self.memory.set(key, vector)
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, dtype, dim, vector, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*key, self.dtype.name, vector.shape[0], vector.astype(self.dtype).tobytes(), now, now),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(now)
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache write failed: %s", e)
+
+    def _prune(self, now: float) -> None:
+        """Drop expired rows, then the least recently used rows beyond max_entries."""
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY accessed_at ASC LIMIT ?)",
+                    (excess,),
+                )
+                logger.info("Embedding cache pruned %d least recently used entries", excess)
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        return {
+            "memory": memory,
+            "disk": {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_seconds,
+                "dtype": self.dtype.name,
+                "hits": self.disk_hits,
+            },
+            "misses": self.misses,
+            "hit_rate": round((memory["hits"] + self.disk_hits) / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide embedding cache, or None when disabled or unavailable."""
+    global _cache
+    if not settings.embedding_cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = EmbeddingCache(
+                        path=settings.embedding_cache_path,
+                        memory_items=settings.embedding_cache_memory_items,
+                        max_entries=settings.embedding_cache_max_entries,
+                        ttl_seconds=settings.embedding_cache_ttl_seconds,
+                        dtype=settings.embedding_cache_dtype,
+                    )
+                except Exception as e:
+                    logger.error("Embedding cache unavailable, continuing without it: %s", e)
+                    settings.embedding_cache_enabled = False
+                    return None
+    return _cache
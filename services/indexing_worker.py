@@ -0,0 +1,193 @@
+# services/indexing_worker.py
+"""
+Indexing worker pool: N threads that claim jobs from the queue in
+services/jobs.py and run `index_document` for each.
+
+The same pool runs standalone (`python worker.py`) or inside the API process
+(INDEXING_WORKERS_IN_API threads). PDF extraction inside each job already runs
+on the process pool in services/pdf_extract.py, so threads here mostly wait
+on I/O (DB, embedding API, vector store).
+"""
+import asyncio
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from config import settings
+from db.database import Document, SessionLocal
+from logger_config import logger
+from services import jobs
+from services.lexical_index import lexical_backend
+
+
+class IndexingWorkerPool:
+    def __init__(self, concurrency: int, name: Optional[str] = None):
+        self.concurrency = max(1, concurrency)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for slot in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._run, args=(f"{self.name}:{slot}",), name=f"indexer-{slot}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.concurrency} indexing worker(s) as {self.name}")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming new jobs and wait up to `timeout` for running ones; unfinished jobs are re-claimed after their lease expires."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            try:
+                db = SessionLocal()
+                try:
+                    job = jobs.claim_job(db, worker_id)
+                finally:
+                    db.close()
+                if job is None:
+                    self._stop.wait(settings.indexing_worker_poll_seconds)
+                    continue
+                run_job(job.id, job.document_id, job.user_id, job.attempts, worker_id)
+            except Exception as e:
+                # DB unavailable etc.; back off and keep the worker alive
+                logger.exception("Indexing worker %s loop error: %s", worker_id, e)
+                self._stop.wait(settings.indexing_worker_poll_seconds)
+
+
+def _heartbeat(job_id: int, worker_id: str, done: threading.Event) -> None:
+    interval = max(1, settings.indexing_job_lease_seconds // 3)
+    while not done.wait(interval):
+        db = SessionLocal()
+        try:
+            if not jobs.renew_lease(db, job_id, worker_id):
+                logger.warning(f"Lost lease on indexing job {job_id} ({worker_id})")
+                return
+        except Exception as e:
+            logger.warning(f"Could not renew lease on indexing job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def run_job(job_id: int, document_id: int, user_id: int, attempt: int, worker_id: str) -> None:
+    """Run one claimed job to completion, keeping its lease alive, and record the outcome."""
+    from services.pinecone_service import index_document
+
+    logger.info(f"Indexing job {job_id} (document {document_id}, attempt {attempt}) claimed by {worker_id}")
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, worker_id, done), daemon=True)
+    heartbeat.start()
+    progress = jobs.JobProgress(job_id, worker_id)
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is None:
+            raise LookupError(f"Document {document_id} no longer exists")
+        index_document(document.file_path, document_id, user_id, db, progress=progress)
+        progress.flush(force=True)
+        jobs.complete_job(db, job_id, worker_id)
+        logger.info(f"Indexing job {job_id} done")
+    except Exception as e:
+        db.rollback()
+        progress.flush(force=True)
+        status = jobs.fail_job(db, job_id, worker_id, f"{type(e).__name__}: {e}\n{traceback.format_exc()}")
+        logger.error(f"Indexing job {job_id} attempt {attempt} failed ({status}): {e}")
+    finally:
+        done.set()
+        db.close()
+
+
+_pool: Optional[IndexingWorkerPool] = None
+_watch_task: Optional[asyncio.Task] = None
+
+
+def _job_changes_since(done_since, written_since) -> tuple:
+    db = SessionLocal()
+    try:
+        return (
+            jobs.users_with_jobs_done_since(db, done_since),
+            jobs.users_with_vectors_written_since(db, written_since),
+        )
+    finally:
+        db.close()
+
+
+async def _watch_completed_jobs(interval: float) -> None:
+    """
+    Invalidate this process's semantic cache for users whose documents were
+    indexed by another process (standalone workers, other API workers), and its
+    retrieval cache as soon as such a job writes vectors.
+    """
+    from services.retrieval_cache import retrieval_cache
+    from services.semantic_cache import semantic_cache
+
+    since = written_since = datetime.now(timezone.utc)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            rows, written = await asyncio.to_thread(_job_changes_since, since, written_since)
+        except Exception as e:
+            logger.warning(f"Indexing completion watcher failed: {e}")
+            continue
+        if rows:
+            since = max(finished_at for _, finished_at in rows)
+        for user_id in {user_id for user_id, _ in rows}:
+            semantic_cache.invalidate_user(user_id)
+        if written:
+            written_since = max(updated_at for _, updated_at in written)
+        for user_id in {user_id for user_id, _ in written}:
+            retrieval_cache.bump(user_id)
+
+
+def host_local_backends() -> List[str]:
+    """Configured backends whose data lives on this host's disk, so indexing elsewhere never reaches them."""
+    local = []
+    if settings.vector_store_backend == "local":
+        local.append(f"VECTOR_STORE_BACKEND=local ({settings.local_vector_store_dir})")
+    if settings.hybrid_search_enabled and lexical_backend() == "sqlite":
+        local.append(f"LEXICAL_INDEX_BACKEND=sqlite ({settings.lexical_index_path})")
+    return local
+
+
+def start_indexing() -> None:
+    """API startup hook: embedded indexer threads (if configured) and the cache invalidation watcher."""
+    global _pool, _watch_task
+    local = host_local_backends()
+    if settings.indexing_workers_in_api <= 0 and local:
+        logger.warning(
+            "INDEXING_WORKERS_IN_API=0 with host-local backends (%s): only workers on this host, sharing its "
+            "DATA_DIR, are visible to this API. Remote workers need VECTOR_STORE_BACKEND=pinecone and "
+            "LEXICAL_INDEX_BACKEND=postgres.", ", ".join(local)
+        )
+    if settings.indexing_workers_in_api > 0 and _pool is None:
+        _pool = IndexingWorkerPool(settings.indexing_workers_in_api)
+        _pool.start()
+    if _watch_task is None or _watch_task.done():
+        interval = max(1.0, settings.indexing_worker_poll_seconds)
+        _watch_task = asyncio.get_running_loop().create_task(_watch_completed_jobs(interval))
+
+
+async def stop_indexing() -> None:
+    global _pool, _watch_task
+    if _watch_task is not None:
+        _watch_task.cancel()
+        try:
+            await _watch_task
+        except asyncio.CancelledError:
+            pass
+        _watch_task = None
+    if _pool is not None:
+        await asyncio.to_thread(_pool.stop, 5)
+        _pool = None
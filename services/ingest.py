@@ -0,0 +1,193 @@
+# services/ingest.py
+"""
+Document intake shared by the upload endpoints and the directory import CLI.
+
+Files are copied to a temp file in fixed-size chunks while their SHA-256 is
+computed, moved atomically into content-addressed storage and registered as a
+Document with an indexing job. Zip archives are unpacked entry by entry the
+same way, so memory use stays at one chunk regardless of file or archive size.
+"""
+import hashlib
+import os
+import tempfile
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from db.database import Document
+from logger_config import logger
+from services.jobs import enqueue_indexing_job
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds the {max_bytes} byte upload limit")
+        self.max_bytes = max_bytes
+
+
+def content_path(file_hash: str) -> str:
+    """Content-addressed location for a stored PDF: <documents_dir>/<ab>/<sha256>.pdf"""
+    return os.path.join(settings.documents_dir, file_hash[:2], f"{file_hash}.pdf")
+
+
+def new_temp_file(suffix: str = ".part") -> Tuple[int, str]:
+    tmp_dir = os.path.join(settings.documents_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    # Same filesystem as the final location so the rename is atomic
+    return tempfile.mkstemp(dir=tmp_dir, suffix=suffix)
+
+
+def copy_to_temp(src: BinaryIO, max_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    Copy a readable binary stream to a temp file in UPLOAD_CHUNK_SIZE pieces, hashing as it goes.
+    Returns (temp_path, sha256 hex, size); raises UploadTooLarge past `max_bytes`.
+    """
+    max_bytes = max_bytes or settings.upload_max_bytes
+    fd, tmp_path = new_temp_file()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(settings.upload_chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def commit_to_storage(tmp_path: str, file_hash: str) -> str:
+    """Atomically move a finished temp file to its content-addressed path."""
+    final_path = content_path(file_hash)
+    if os.path.exists(final_path):
+        # Identical bytes already stored
+        os.remove(tmp_path)
+        return final_path
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return final_path
+
+
+def _find_duplicate(db: Session, user_id: int, file_hash: str) -> Optional[Document]:
+    return db.query(Document).filter(
+        Document.content_hash == file_hash,
+        Document.user_id == user_id
+    ).first()
+
+
+def _already_exists(document: Document) -> Dict[str, Any]:
+    return {"filename": document.filename, "status": "already_exists", "document_id": document.id, "job_id": None}
+
+
+def register_document(db: Session, user_id: int, filename: str, tmp_path: str, file_hash: str) -> Dict[str, Any]:
+    """
+    Store a hashed temp file and queue it for indexing.
+
+    Returns {"filename", "status", "document_id", "job_id"} where status is
+    "already_exists" (same bytes already uploaded by this user), or "indexing".
+    A file with the same name from the same user is treated as a new revision of
+    that document and re-indexed in place, so only changed chunks are embedded.
+    """
+    # Check if document already exists for this user
+    existing_doc = _find_duplicate(db, user_id, file_hash)
+    if existing_doc:
+        os.remove(tmp_path)
+        logger.info(f"Document already exists for user {user_id}: {existing_doc.filename}")
+        return _already_exists(existing_doc)
+
+    # Identical bytes uploaded by another user share the stored file
+    file_path = commit_to_storage(tmp_path, file_hash)
+
+    document = db.query(Document).filter(
+        Document.filename == filename,
+        Document.user_id == user_id
+    ).order_by(Document.id.desc()).first()
+    try:
+        if document:
+            document.file_path = file_path
+            document.content_hash = file_hash
+            document.indexed = False
+            db.commit()
+            logger.info(f"Updated document {document.id} with a new revision of {filename}")
+        else:
+            document = Document(
+                filename=filename,
+                file_path=file_path,
+                content_hash=file_hash,
+                user_id=user_id
+            )
+            db.add(document)
+            db.commit()
+            db.refresh(document)
+            logger.info(f"Created document record with ID: {document.id}")
+    except IntegrityError:
+        # The same user registered the same bytes concurrently (UNIQUE(user_id, content_hash))
+        db.rollback()
+        existing_doc = _find_duplicate(db, user_id, file_hash)
+        if existing_doc is None:
+            raise
+        logger.info(f"Document already exists for user {user_id}: {existing_doc.filename}")
+        return _already_exists(existing_doc)
+
+    # Index document via the durable job queue (picked up by indexing workers)
+    job = enqueue_indexing_job(db, document.id, user_id)
+    logger.info(f"Queued indexing job {job.id} for document {document.id}")
+    return {"filename": filename, "status": "indexing", "document_id": document.id, "job_id": job.id}
+
+
+def _is_pdf_entry(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    base = os.path.basename(name)
+    return (
+        not info.is_dir()
+        and name.lower().endswith(".pdf")
+        and not name.startswith("__MACOSX/")
+        and not base.startswith(".")
+    )
+
+
+def iter_zip_pdfs(zip_path: str, max_files: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Copy each PDF in a zip archive to a temp file, one at a time.
+
+    Yields {"filename", "tmp_path", "hash", "size"} per PDF, or {"filename", "error"}
+    for entries that are too large or unreadable. Entry sizes are enforced while
+    decompressing, not trusted from the archive header.
+    """
+    max_files = max_files or settings.bulk_max_files
+    count = 0
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            if not _is_pdf_entry(info):
+                continue
+            count += 1
+            if count > max_files:
+                yield {"filename": info.filename, "error": f"Archive has more than {max_files} PDFs; remaining entries skipped"}
+                return
+            if info.file_size > settings.upload_max_bytes:
+                yield {"filename": info.filename, "error": str(UploadTooLarge(settings.upload_max_bytes))}
+                continue
+            try:
+                with archive.open(info) as src:
+                    tmp_path, file_hash, size = copy_to_temp(src)
+            except (UploadTooLarge, zipfile.BadZipFile, OSError, RuntimeError) as e:
+                yield {"filename": info.filename, "error": str(e)}
+                continue
+            yield {"filename": info.filename, "tmp_path": tmp_path, "hash": file_hash, "size": size}
+
+
+def ingest_path(db: Session, user_id: int, path: str, filename: Optional[str] = None) -> Dict[str, Any]:
+    """Register one PDF from the local filesystem (directory import)."""
+    with open(path, "rb") as src:
+        tmp_path, file_hash, _ = copy_to_temp(src)
+    return register_document(db, user_id, filename or os.path.basename(path), tmp_path, file_hash)
@@ -0,0 +1,372 @@
+# services/jobs.py
+"""
+DB-backed indexing job queue.
+
+  enqueue  -> row in indexing_jobs with status "queued"
+  claim    -> a worker atomically moves the oldest runnable job to "running",
+              takes a lease (lease_owner, lease_expires_at) and bumps attempts
+  renew    -> the worker extends its lease while the job is still running
+  complete -> "done"
+  fail     -> back to "queued" with exponential backoff, or "failed" with the
+              error kept in last_error once max_attempts is reached
+
+A job whose lease runs out (worker crashed, killed on deploy) becomes claimable
+again, so an accepted upload is never lost. Claiming uses SELECT ... FOR UPDATE
+SKIP LOCKED where the database supports it and a compare-and-set UPDATE on
+(id, attempts) everywhere, so concurrent workers never run the same attempt.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from db.database import IndexingJob, SessionLocal
+from logger_config import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+MAX_ERROR_LENGTH = 4000
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_indexing_job(db: Session, document_id: int, user_id: int) -> IndexingJob:
+    job = IndexingJob(
+        document_id=document_id,
+        user_id=user_id,
+        status=QUEUED,
+        attempts=0,
+        max_attempts=max(1, settings.indexing_job_max_attempts),
+        run_after=_now(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Enqueued indexing job {job.id} for document {document_id}")
+    return job
+
+
+def _runnable(now: datetime):
+    return or_(
+        and_(IndexingJob.status == QUEUED, IndexingJob.run_after <= now),
+        # Lease ran out: the worker holding it is gone
+        and_(
+            IndexingJob.status == RUNNING,
+            IndexingJob.lease_expires_at < now,
+            IndexingJob.attempts < IndexingJob.max_attempts,
+        ),
+    )
+
+
+def _reap_exhausted(db: Session, now: datetime) -> None:
+    """Fail jobs whose last allowed attempt lost its worker."""
+    result = db.execute(
+        update(IndexingJob)
+        .execution_options(synchronize_session=False)
+        .where(
+            IndexingJob.status == RUNNING,
+            IndexingJob.lease_expires_at < now,
+            IndexingJob.attempts >= IndexingJob.max_attempts,
+        )
+        .values(
+            status=FAILED,
+            finished_at=now,
+            updated_at=now,
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error="Lease expired on the final attempt (worker stopped or crashed)",
+        )
+    )
+    if result.rowcount:
+        logger.warning(f"Marked {result.rowcount} indexing job(s) failed after lease expiry")
+
+
+def claim_job(db: Session, worker_id: str, lease_seconds: Optional[int] = None) -> Optional[IndexingJob]:
+    """Claim the next runnable job for `worker_id`, or return None if there is none."""
+    lease_seconds = lease_seconds or settings.indexing_job_lease_seconds
+    now = _now()
+    _reap_exhausted(db, now)
+    # Another worker may take the candidate between SELECT and UPDATE (no row locks on SQLite); try the next one
+    for _ in range(5):
+        candidate = db.execute(
+            select(IndexingJob.id, IndexingJob.attempts)
+            .where(_runnable(now))
+            .order_by(IndexingJob.run_after, IndexingJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if candidate is None:
+            db.commit()
+            return None
+        result = db.execute(
+            update(IndexingJob)
+            .execution_options(synchronize_session=False)
+            .where(
+                IndexingJob.id == candidate.id,
+                IndexingJob.attempts == candidate.attempts,
+                _runnable(now),
+            )
+            .values(
+                status=RUNNING,
+                attempts=IndexingJob.attempts + 1,
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                started_at=now,
+                finished_at=None,
+                updated_at=now,
+                # Progress restarts with every attempt
+                stage=None,
+                pages_total=None,
+                pages_processed=0,
+                chunks_processed=0,
+                chunks_embedded=0,
+                chunks_unchanged=0,
+                vectors_upserted=0,
+                stage_seconds=None,
+            )
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return db.get(IndexingJob, candidate.id, populate_existing=True)
+    return None
+
+
+def _owned(job_id: int, worker_id: str):
+    return and_(IndexingJob.id == job_id, IndexingJob.lease_owner == worker_id, IndexingJob.status == RUNNING)
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str, lease_seconds: Optional[int] = None) -> bool:
+    """Extend the lease; False means the job is no longer ours (lease expired and was re-claimed)."""
+    lease_seconds = lease_seconds or settings.indexing_job_lease_seconds
+    result = db.execute(
+        update(IndexingJob)
+        .execution_options(synchronize_session=False)
+        .where(_owned(job_id, worker_id))
+        .values(lease_expires_at=_now() + timedelta(seconds=lease_seconds))
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def complete_job(db: Session, job_id: int, worker_id: str) -> bool:
+    result = db.execute(
+        update(IndexingJob)
+        .execution_options(synchronize_session=False)
+        .where(_owned(job_id, worker_id))
+        .values(status=DONE, stage=None, finished_at=_now(), updated_at=_now(),
+                lease_owner=None, lease_expires_at=None, last_error=None)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str) -> Optional[str]:
+    """Record a failed attempt; returns the job's new status (queued for retry, or failed)."""
+    job = db.get(IndexingJob, job_id, populate_existing=True)
+    if job is None or job.lease_owner != worker_id or job.status != RUNNING:
+        db.rollback()
+        return None
+    now = _now()
+    values = {
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "updated_at": now,
+        "last_error": (error or "")[:MAX_ERROR_LENGTH],
+    }
+    if job.attempts >= job.max_attempts:
+        values.update(status=FAILED, finished_at=now)
+    else:
+        delay = settings.indexing_job_retry_base_seconds * (2 ** max(0, job.attempts - 1))
+        values.update(status=QUEUED, run_after=now + timedelta(seconds=delay))
+    db.execute(
+        update(IndexingJob)
+        .execution_options(synchronize_session=False)
+        .where(_owned(job_id, worker_id))
+        .values(**values)
+    )
+    db.commit()
+    return values["status"]
+
+
+def users_with_jobs_done_since(db: Session, since) -> List[tuple]:
+    """(user_id, finished_at) for jobs completed after `since`; used to invalidate caches across processes."""
+    rows = db.execute(
+        select(IndexingJob.user_id, IndexingJob.finished_at)
+        .where(IndexingJob.status == DONE, IndexingJob.finished_at > since)
+    ).all()
+    return [(row.user_id, row.finished_at) for row in rows]
+
+
+def users_with_vectors_written_since(db: Session, since) -> List[tuple]:
+    """
+    (user_id, updated_at) for jobs that wrote vectors or finished after `since`,
+    including running ones; used to invalidate retrieval caches across processes.
+    """
+    rows = db.execute(
+        select(IndexingJob.user_id, IndexingJob.updated_at)
+        .where(
+            IndexingJob.updated_at > since,
+            or_(IndexingJob.vectors_upserted > 0, IndexingJob.status == DONE),
+        )
+    ).all()
+    return [(row.user_id, row.updated_at) for row in rows]
+
+
+class JobProgress:
+    """
+    Per-attempt progress tracker for index_document.
+
+    Counters and time spent per stage are kept in memory and written to the
+    job row at most every `min_interval` seconds (and on `flush(force=True)`),
+    so the API and other processes can report them without slowing indexing
+    down with per-chunk writes. With job_id=None it only counts (direct calls).
+    """
+
+    STAGES = ("extracting", "embedding", "upserting")
+
+    def __init__(self, job_id: Optional[int] = None, worker_id: Optional[str] = None, min_interval: float = 1.0):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.min_interval = min_interval
+        self.stage: Optional[str] = None
+        self.counters: Dict[str, Any] = {
+            "pages_total": None,
+            "pages_processed": 0,
+            "chunks_processed": 0,
+            "chunks_embedded": 0,
+            "chunks_unchanged": 0,
+            "vectors_upserted": 0,
+        }
+        self.stage_seconds: Dict[str, float] = {}
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, **values) -> None:
+        with self._lock:
+            self.counters.update(values)
+
+    def add(self, **increments) -> None:
+        with self._lock:
+            for key, value in increments.items():
+                self.counters[key] = (self.counters.get(key) or 0) + value
+        self.flush()
+
+    @contextmanager
+    def stage_timer(self, stage: str):
+        """Attribute the enclosed block's wall time to `stage` and report it as the current stage."""
+        self.stage = stage
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + time.perf_counter() - start
+
+    def flush(self, force: bool = False) -> None:
+        if self.job_id is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.min_interval:
+            return
+        self._last_flush = now
+        with self._lock:
+            values = dict(self.counters)
+            values["stage"] = self.stage
+            values["stage_seconds"] = json.dumps({k: round(v, 3) for k, v in self.stage_seconds.items()})
+        values["updated_at"] = _now()
+        criteria = [IndexingJob.id == self.job_id, IndexingJob.status == RUNNING]
+        if self.worker_id is not None:
+            criteria.append(IndexingJob.lease_owner == self.worker_id)
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(IndexingJob)
+                .execution_options(synchronize_session=False)
+                .where(*criteria)
+                .values(**values)
+            )
+            db.commit()
+        except Exception as e:
+            # Progress is best effort; never fail the job over it
+            db.rollback()
+            logger.warning(f"Could not record progress for indexing job {self.job_id}: {e}")
+        finally:
+            db.close()
+
+
+def _seconds_between(start, end) -> Optional[float]:
+    if start is None or end is None:
+        return None
+    # SQLite hands back naive datetimes (stored as UTC)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    return round((end - start).total_seconds(), 3)
+
+
+def job_status(job: IndexingJob) -> Dict[str, Any]:
+    """JSON-safe view of a job: state is queued | extracting | embedding | upserting | done | failed."""
+    now = _now()
+    state = job.status
+    if job.status == RUNNING:
+        state = job.stage or "extracting"
+    # Lease ran out without renewal: the worker is gone or hung
+    stalled = job.status == RUNNING and job.lease_expires_at is not None and _seconds_between(job.lease_expires_at, now) > 0
+    try:
+        stage_seconds = json.loads(job.stage_seconds) if job.stage_seconds else {}
+    except ValueError:
+        stage_seconds = {}
+    return {
+        "job_id": job.id,
+        "document_id": job.document_id,
+        "state": state,
+        "status": job.status,
+        "stage": job.stage,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "pages_total": job.pages_total,
+        "pages_processed": job.pages_processed,
+        "chunks_processed": job.chunks_processed,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_unchanged": job.chunks_unchanged,
+        "vectors_upserted": job.vectors_upserted,
+        "stage_seconds": stage_seconds,
+        # Time waiting in the queue before the current attempt started
+        "queued_seconds": _seconds_between(job.created_at, job.started_at),
+        "elapsed_seconds": _seconds_between(job.started_at, job.finished_at or now) if job.started_at else None,
+        "stalled": stalled,
+        "lease_owner": job.lease_owner,
+        "error": job.last_error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+
+
+def latest_job_for_document(db: Session, document_id: int) -> Optional[IndexingJob]:
+    return (
+        db.query(IndexingJob)
+        .filter(IndexingJob.document_id == document_id)
+        .order_by(IndexingJob.id.desc())
+        .first()
+    )
+
+
+def list_jobs(db: Session, status: Optional[str] = None, limit: int = 50) -> List[IndexingJob]:
+    query = db.query(IndexingJob)
+    if status:
+        query = query.filter(IndexingJob.status == status)
+    return query.order_by(IndexingJob.id.desc()).limit(limit).all()
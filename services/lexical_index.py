@@ -0,0 +1,391 @@
+# services/lexical_index.py
+"""
+Lexical (full-text) index for hybrid retrieval.
+
+Dense similarity is weak on exact tokens (part numbers, names, error codes).
+Every chunk upserted to the vector store is also written to an inverted index,
+queried with term-frequency ranking and scoped to one user. Retrieval merges
+the lexical and dense rankings with `reciprocal_rank_fusion`.
+
+Two backends with the same interface, chosen by LEXICAL_INDEX_BACKEND:
+
+  postgres  `PostgresLexicalIndex`, a tsvector/GIN table in the application
+            database ranked by ts_rank; the API and workers on other machines
+            all read and write the same index.
+  sqlite    `LexicalIndex`, an FTS5 file ranked by BM25. It lives on one host:
+            chunks indexed by a worker elsewhere never reach the API's copy.
+
+Rows are keyed by vector id, so re-indexing and stale-chunk deletion keep both
+indexes in step.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy import bindparam, text
+
+from config import settings
+from logger_config import logger
+
+# Longer queries add little precision and make the MATCH expression slow
+MAX_QUERY_TERMS = 32
+_TERM = re.compile(r"[\w][\w\-./:]*[\w]|[\w]", re.UNICODE)
+_CHUNK_IDS = 500  # stay under SQLite's bound-parameter limit
+# Function words and conversational filler match nearly every chunk; a lexical hit should mean a shared content term
+STOPWORDS = frozenset("""
+a about also an and any are as at be but by can could did do does explain for from get give had has have
+help how i if in into is it its just know let like me more my need no not of on or our please say show so
+some tell than thanks that the their them then there these they this to want was we were what when where
+which who why will with would you your
+""".split())
+
+
+def query_terms(query: str) -> List[str]:
+    """Whitespace/punctuation-separated terms without stopwords, identifiers like "AB-1234" or "E_CONN.2" kept whole."""
+    terms = []
+    for term in _TERM.findall(query or ""):
+        term = term.lower()
+        if term not in terms and term not in STOPWORDS:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def term_coverage(terms: Sequence[str], text: str) -> float:
+    """Share of `terms` (from `query_terms`) that occur as whole terms in `text`."""
+    if not terms:
+        return 0.0
+    present = {term.lower() for term in _TERM.findall(text or "")}
+    return sum(1 for term in terms if term in present) / len(terms)
+
+
+def _index_rows(vectors: Iterable[Dict[str, Any]]) -> List[tuple]:
+    """(vector_id, user_id, document_id, text, metadata) for vectors that carry text and a user."""
+    rows = []
+    for vector in vectors:
+        metadata = dict(vector.get("metadata") or {})
+        chunk_text = metadata.get("text")
+        if not chunk_text or metadata.get("user_id") is None:
+            continue
+        rows.append((vector["id"], int(metadata["user_id"]), metadata.get("document_id"), chunk_text, metadata))
+    return rows
+
+
+def _to_match(vector_id: str, metadata: str, score: float, terms: Sequence[str]) -> Dict[str, Any]:
+    metadata = json.loads(metadata)
+    return {
+        "id": vector_id,
+        "score": score,
+        "metadata": metadata,
+        "coverage": term_coverage(terms, metadata.get("text")),
+    }
+
+
+def _match_expression(terms: Sequence[str]) -> str:
+    # Each term as a quoted phrase: FTS5 operators in user text are taken literally,
+    # and an identifier the tokenizer splits ("ab-1234" -> ab 1234) must match as adjacent tokens
+    return " OR ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+class LexicalIndex:
+    """SQLite FTS5 index in a file on this host."""
+
+    shared = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_chunks (
+                id INTEGER PRIMARY KEY,
+                vector_id TEXT NOT NULL UNIQUE,
+                user_id INTEGER NOT NULL,
+                document_id INTEGER,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_user ON lexical_chunks(user_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_document ON lexical_chunks(document_id)")
+        # rowid = lexical_chunks.id
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS lexical_fts USING fts5(text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def upsert(self, vectors: Iterable[Dict[str, Any]]) -> int:
+        """Index vectors in upsert format ({"id", "metadata": {"user_id", "text", ...}}); returns rows written."""
+        rows = _index_rows(vectors)
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for vector_id, user_id, document_id, chunk_text, metadata in rows:
+                    existing = self._conn.execute(
+                        "SELECT id FROM lexical_chunks WHERE vector_id = ?", (vector_id,)
+                    ).fetchone()
+                    if existing is not None:
+                        self._conn.execute("DELETE FROM lexical_fts WHERE rowid = ?", (existing[0],))
+                        self._conn.execute("DELETE FROM lexical_chunks WHERE id = ?", (existing[0],))
+                    cursor = self._conn.execute(
+                        "INSERT INTO lexical_chunks (vector_id, user_id, document_id, metadata) VALUES (?, ?, ?, ?)",
+                        (vector_id, user_id, document_id, json.dumps(metadata, default=str)),
+                    )
+                    self._conn.execute("INSERT INTO lexical_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, chunk_text))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def _delete_where(self, where: str, params: Sequence[Any]) -> int:
+        self._conn.execute(f"DELETE FROM lexical_fts WHERE rowid IN (SELECT id FROM lexical_chunks WHERE {where})", params)
+        return self._conn.execute(f"DELETE FROM lexical_chunks WHERE {where}", params).rowcount
+
+    def delete(self, ids: Sequence[str]) -> int:
+        removed = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for i in range(0, len(ids), _CHUNK_IDS):
+                    part = list(ids[i:i + _CHUNK_IDS])
+                    marks = ",".join("?" * len(part))
+                    removed += self._delete_where(f"vector_id IN ({marks})", part)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def delete_document(self, document_id: int) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._delete_where("document_id = ?", (document_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def delete_user(self, user_id: int) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._delete_where("user_id = ?", (int(user_id),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def has_document(self, document_id: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM lexical_chunks WHERE document_id = ? LIMIT 1", (document_id,)
+            ).fetchone()
+        return row is not None
+
+    def search(self, query: str, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        BM25-ranked matches for `user_id`, best first, as {"id", "score", "metadata", "coverage"}
+        (score: higher is better; coverage: share of the query's terms the chunk contains).
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.vector_id, c.metadata, bm25(lexical_fts) AS rank "
+                "FROM lexical_fts JOIN lexical_chunks c ON c.id = lexical_fts.rowid "
+                "WHERE lexical_fts MATCH ? AND c.user_id = ? "
+                "ORDER BY rank LIMIT ?",
+                (_match_expression(terms), int(user_id), int(limit)),
+            ).fetchall()
+        # FTS5's bm25() is negated so that ORDER BY ascending puts the best match first
+        return [_to_match(vector_id, metadata, -rank, terms) for vector_id, metadata, rank in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "entries": entries}
+
+
+# Serializes schema creation when the API and workers start together
+_SCHEMA_LOCK_KEY = 7243001
+
+
+class PostgresLexicalIndex:
+    """
+    Full-text index in the application's PostgreSQL database: one row per chunk with a
+    'simple' (no stemming, no stopwords) tsvector under a GIN index, ranked by ts_rank.
+    Query terms are matched as phrases, so split identifiers ("ab-1234") stay adjacent.
+    """
+
+    shared = True
+
+    def __init__(self, engine):
+        self.engine = engine
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS lexical_chunks (
+                    vector_id TEXT PRIMARY KEY,
+                    user_id INTEGER NOT NULL,
+                    document_id INTEGER,
+                    metadata TEXT NOT NULL,
+                    text_search TSVECTOR NOT NULL
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_user ON lexical_chunks (user_id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_lexical_chunks_document ON lexical_chunks (document_id)"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_lexical_chunks_text_search ON lexical_chunks USING GIN (text_search)"
+            ))
+
+    def upsert(self, vectors: Iterable[Dict[str, Any]]) -> int:
+        """Index vectors in upsert format ({"id", "metadata": {"user_id", "text", ...}}); returns rows written."""
+        rows = [
+            {
+                "vector_id": vector_id,
+                "user_id": user_id,
+                "document_id": document_id,
+                # PostgreSQL text cannot hold NUL characters
+                "text": chunk_text.replace("\x00", " "),
+                "metadata": json.dumps(metadata, default=str),
+            }
+            for vector_id, user_id, document_id, chunk_text, metadata in _index_rows(vectors)
+        ]
+        if not rows:
+            return 0
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO lexical_chunks (vector_id, user_id, document_id, metadata, text_search)
+                VALUES (:vector_id, :user_id, :document_id, :metadata, to_tsvector('simple', :text))
+                ON CONFLICT (vector_id) DO UPDATE SET
+                    user_id = EXCLUDED.user_id,
+                    document_id = EXCLUDED.document_id,
+                    metadata = EXCLUDED.metadata,
+                    text_search = EXCLUDED.text_search
+            """), rows)
+        return len(rows)
+
+    def _delete_where(self, where: str, params: Dict[str, Any], *binds) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(text(f"DELETE FROM lexical_chunks WHERE {where}").bindparams(*binds), params).rowcount
+
+    def delete(self, ids: Sequence[str]) -> int:
+        if not ids:
+            return 0
+        return self._delete_where("vector_id IN :ids", {"ids": list(ids)}, bindparam("ids", expanding=True))
+
+    def delete_document(self, document_id: int) -> int:
+        return self._delete_where("document_id = :document_id", {"document_id": document_id})
+
+    def delete_user(self, user_id: int) -> int:
+        return self._delete_where("user_id = :user_id", {"user_id": int(user_id)})
+
+    def has_document(self, document_id: int) -> bool:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT 1 FROM lexical_chunks WHERE document_id = :document_id LIMIT 1"),
+                {"document_id": document_id},
+            ).first()
+        return row is not None
+
+    def search(self, query: str, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        ts_rank-ranked matches for `user_id`, best first, as {"id", "score", "metadata", "coverage"}
+        (score: higher is better; coverage: share of the query's terms the chunk contains).
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        params: Dict[str, Any] = {f"t{i}": term for i, term in enumerate(terms)}
+        # Terms OR-ed together (tsquery ||), each as a phrase
+        tsquery = " || ".join(f"phraseto_tsquery('simple', :t{i})" for i in range(len(terms)))
+        params.update(user_id=int(user_id), limit=int(limit))
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT vector_id, metadata, ts_rank(text_search, tsq.q) AS rank
+                FROM lexical_chunks, (SELECT {tsquery} AS q) AS tsq
+                WHERE user_id = :user_id AND text_search @@ tsq.q
+                ORDER BY rank DESC
+                LIMIT :limit
+            """), params).all()
+        return [_to_match(vector_id, metadata, float(rank), terms) for vector_id, metadata, rank in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            entries = conn.execute(text("SELECT COUNT(*) FROM lexical_chunks")).scalar()
+        return {"backend": "postgres", "entries": entries}
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Dict[str, Any]]], weights: Sequence[float],
+                           k: int = 60, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Merge ranked match lists (dicts with "id") by weighted reciprocal rank:
+    score(d) = sum(weight_i / (k + rank_i(d))). Scores from different retrievers
+    are not comparable, ranks are. Returns the fused matches with "score" replaced
+    by the fused score and "sources" listing which rankings contained them.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for source, (ranking, weight) in enumerate(zip(rankings, weights)):
+        if weight <= 0:
+            continue
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.get(match["id"])
+            if entry is None:
+                entry = fused[match["id"]] = {**match, "score": 0.0, "sources": []}
+            entry["score"] += weight / (k + rank)
+            entry["sources"].append(source)
+    ordered = sorted(fused.values(), key=lambda m: m["score"], reverse=True)
+    return ordered[:limit] if limit else ordered
+
+
+def lexical_backend() -> str:
+    """Configured backend with "auto" resolved: "postgres" or "sqlite"."""
+    backend = settings.lexical_index_backend
+    if backend == "auto":
+        return "postgres" if settings.DATABASE_URL.startswith("postgresql") else "sqlite"
+    if backend not in ("postgres", "sqlite"):
+        raise ValueError(f"Unknown LEXICAL_INDEX_BACKEND: {backend} (expected auto, postgres or sqlite)")
+    return backend
+
+
+def create_lexical_index(backend: str):
+    if backend == "postgres":
+        from db.database import engine
+        if engine.dialect.name != "postgresql":
+            raise ValueError(f"LEXICAL_INDEX_BACKEND=postgres needs a PostgreSQL DATABASE_URL, not {engine.dialect.name}")
+        logger.info("Using PostgreSQL lexical index")
+        return PostgresLexicalIndex(engine)
+    logger.info("Using SQLite lexical index at %s", settings.lexical_index_path)
+    return LexicalIndex(settings.lexical_index_path)
+
+
+_index: Optional[Union[LexicalIndex, PostgresLexicalIndex]] = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[Union[LexicalIndex, PostgresLexicalIndex]]:
+    """Return the process-wide lexical index, or None when hybrid search is disabled or unavailable."""
+    global _index
+    if not settings.hybrid_search_enabled:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = create_lexical_index(lexical_backend())
+                except Exception as e:
+                    # e.g. SQLite built without FTS5, database unreachable
+                    logger.error("Lexical index unavailable, continuing with dense retrieval only: %s", e)
+                    settings.hybrid_search_enabled = False
+                    return None
+    return _index
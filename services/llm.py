@@ -1,5 +1,7 @@
 # services/llm.py
-from openai import OpenAI
+from typing import AsyncIterator
+
+from openai import AsyncOpenAI, OpenAI
 from config import settings
 from logger_config import logger  # Import the logger
 
@@ -8,7 +10,56 @@ openai = OpenAI(
     base_url=settings.BASE_URL,
 )
 
+# Async client for the request path so LLM calls don't block the event loop
+async_openai = AsyncOpenAI(
+    api_key=settings.llm_api_key,
+    base_url=settings.BASE_URL,
+)
+
 DEFAULT_LLM_MODEL = "openai/gpt-oss-120b"
+SYSTEM_PROMPT = "You are a helpful assistant. Use the context to answer concisely."
+EMPTY_RESPONSE = "Sorry, I couldn't generate a response."
+ERROR_RESPONSE = "Sorry, I'm having trouble generating a response right now."
+
+
+def is_fallback_response(text: str) -> bool:
+    """True for the canned replies returned when generation fails (never worth caching)."""
+    return text in (EMPTY_RESPONSE, ERROR_RESPONSE)
+
+
+def _build_messages(user_message: str, context: str) -> list:
+    # No relevant context: leave the section out rather than padding the prompt with a placeholder
+    if context:
+        prompt = f"Context:\n{context}\n\nUser: {user_message}\nAssistant:"
+    else:
+        prompt = f"User: {user_message}\nAssistant:"
+    logger.debug("Prepared prompt to LLM (len=%d)", len(prompt))
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _extract_text(completion) -> str:
+    """Pull the reply text out of a completion, tolerating several SDK response shapes."""
+    try:
+        result = completion.choices[0].message.content
+    except Exception:
+        # fallback to dict-like shape
+        if isinstance(completion, dict):
+            choices = completion.get("choices", [])
+            if choices:
+                # some responses put text under 'text'
+                result = choices[0].get("message", {}).get("content") or choices[0].get("text")
+            else:
+                result = ""
+        else:
+            result = str(completion)
+
+    result = result or EMPTY_RESPONSE
+    logger.info("LLM response generated (len=%d)", len(result))
+    return str(result)
+
 
 def generate_response(user_message: str, context: str) -> str:
     """
@@ -17,37 +68,62 @@ def generate_response(user_message: str, context: str) -> str:
     """
     logger.info("Generating LLM response - After function execution - llm.py")
     try:
-        prompt = f"Context:\n{context}\n\nUser: {user_message}\nAssistant:"
-        logger.debug("Prepared prompt to LLM (len=%d)", len(prompt))
-
         # Use chat/completions API if available
         completion = openai.chat.completions.create(
             model=DEFAULT_LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant. Use the context to answer concisely."},
-                {"role": "user", "content": prompt},
-            ],
+            messages=_build_messages(user_message, context),
             max_tokens=None,
         )
+        return _extract_text(completion)
+    except Exception as e:
+        logger.exception("Error generating LLM response: %s", e)
+        return ERROR_RESPONSE
 
-        # extract text robustly
-        try:
-            result = completion.choices[0].message.content
-        except Exception:
-            # fallback to dict-like shape
-            if isinstance(completion, dict):
-                choices = completion.get("choices", [])
-                if choices:
-                    # some responses put text under 'text'
-                    result = choices[0].get("message", {}).get("content") or choices[0].get("text")
-                else:
-                    result = ""
-            else:
-                result = str(completion)
 
-        result = result or "Sorry, I couldn't generate a response."
-        logger.info("LLM response generated (len=%d)", len(result))
-        return str(result)
+async def agenerate_response(user_message: str, context: str) -> str:
+    """Async variant of `generate_response` using the AsyncOpenAI client."""
+    logger.info("Generating LLM response (async) - llm.py")
+    try:
+        completion = await async_openai.chat.completions.create(
+            model=DEFAULT_LLM_MODEL,
+            messages=_build_messages(user_message, context),
+            max_tokens=None,
+        )
+        return _extract_text(completion)
     except Exception as e:
         logger.exception("Error generating LLM response: %s", e)
-        return "Sorry, I'm having trouble generating a response right now."
+        return ERROR_RESPONSE
+
+
+async def agenerate_response_stream(user_message: str, context: str) -> AsyncIterator[str]:
+    """
+    Stream the LLM reply token-by-token (chat.completions with stream=True).
+    Yields text deltas as they arrive. A failure before the first delta yields the usual
+    apology text; a failure mid-stream is re-raised, since the partial reply is unusable.
+    """
+    logger.info("Streaming LLM response - llm.py")
+    produced = False
+    try:
+        stream = await async_openai.chat.completions.create(
+            model=DEFAULT_LLM_MODEL,
+            messages=_build_messages(user_message, context),
+            max_tokens=None,
+            stream=True,
+        )
+        async for chunk in stream:
+            try:
+                delta = chunk.choices[0].delta.content
+            except (AttributeError, IndexError):
+                delta = None
+            if delta:
+                produced = True
+                yield delta
+    except Exception as e:
+        logger.exception("Error streaming LLM response: %s", e)
+        if produced:
+            raise
+        yield ERROR_RESPONSE
+        return
+
+    if not produced:
+        yield EMPTY_RESPONSE
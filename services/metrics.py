@@ -0,0 +1,84 @@
+# services/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Upper bounds (seconds) for latency buckets; the last bucket catches everything above.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket latency histogram (values in seconds)."""
+
+    def __init__(self, name: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.errors = 0
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            idx = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    idx = i
+                    break
+            self._counts[idx] += 1
+            self.count += 1
+            self.total += seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+            if error:
+                self.errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "sum_s": round(self.total, 6),
+                "avg_s": round(self.total / self.count, 6) if self.count else None,
+                "min_s": round(self.min, 6) if self.min is not None else None,
+                "max_s": round(self.max, 6) if self.max is not None else None,
+                "buckets": dict(zip(labels, self._counts)),
+            }
+
+
+_registry: Dict[str, LatencyHistogram] = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str) -> LatencyHistogram:
+    """Get or create the histogram registered under `name`."""
+    with _registry_lock:
+        hist = _registry.get(name)
+        if hist is None:
+            hist = LatencyHistogram(name)
+            _registry[name] = hist
+        return hist
+
+
+@contextmanager
+def timed(name: str):
+    """Time the enclosed block into the named histogram; exceptions are counted as errors."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        histogram(name).observe(time.perf_counter() - start, error=True)
+        raise
+    histogram(name).observe(time.perf_counter() - start)
+
+
+def snapshot(prefix: str = "") -> Dict[str, Dict[str, Any]]:
+    """Return snapshots of all histograms whose name starts with `prefix`."""
+    with _registry_lock:
+        items = [(n, h) for n, h in _registry.items() if n.startswith(prefix)]
+    return {name: hist.snapshot() for name, hist in sorted(items)}
@@ -0,0 +1,201 @@
+# services/pdf_extract.py
+"""
+PDF text extraction on a process pool.
+
+Text extraction is CPU-bound and holds the GIL, so a large PDF parsed inside
+the API process stalls every other request. `iter_pdf_pages` splits the
+document into page ranges, extracts them in worker processes and yields
+(page_number, text) in page order as soon as each range is done, so callers
+can start embedding the first pages while later ones are still being parsed.
+
+Two engines are available (PDF_EXTRACT_ENGINE): "pdfium" (pypdfium2, fast,
+plain text) with a per-page pdfplumber fallback when it finds no text, and
+"pdfplumber" (layout-aware, slower).
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional, Tuple
+
+from config import settings
+from logger_config import logger
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def available_cores() -> int:
+    """CPUs this process may run on (respects affinity / container cpusets where exposed)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _worker_count() -> int:
+    configured = settings.pdf_extract_workers
+    if configured > 0:
+        return configured
+    # Leave a core for the event loop
+    return max(1, available_cores() - 1)
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Shared extraction pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = _worker_count()
+            # spawn, not fork: the API process has live threads, sockets and DB connections
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Started PDF extraction pool with {workers} worker(s)")
+        return _pool
+
+
+def shutdown_extraction_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(broken: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def count_pages(file_path: str) -> int:
+    try:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except ImportError:
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+
+def _pdfplumber_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    import pdfplumber
+    pages = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in range(start, min(end, len(pdf.pages))):
+            page = pdf.pages[i]
+            pages.append((i + 1, page.extract_text() or ""))
+            # pdfplumber caches layout objects per page; drop them to keep worker memory flat
+            page.close()
+    return pages
+
+
+def _pdfium_page_text(pdf, i: int) -> str:
+    page = pdf[i]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n")
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+
+def _pdfium_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    pdfium text extraction (no layout analysis). Pages where it finds nothing
+    are retried with pdfplumber, which copes better with some unusual encodings.
+    """
+    import pypdfium2 as pdfium
+    pages = []
+    fallback = None
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for i in range(start, min(end, len(pdf))):
+            try:
+                text = _pdfium_page_text(pdf, i)
+            except Exception as e:
+                logger.debug(f"pdfium failed on page {i + 1} of {file_path}: {e}")
+                text = ""
+            if not text.strip():
+                if fallback is None:
+                    import pdfplumber
+                    fallback = pdfplumber.open(file_path)
+                page = fallback.pages[i]
+                text = page.extract_text() or ""
+                page.close()
+            pages.append((i + 1, text))
+    finally:
+        pdf.close()
+        if fallback is not None:
+            fallback.close()
+    return pages
+
+
+EXTRACTION_ENGINES = {
+    "pdfium": _pdfium_range,
+    "pdfplumber": _pdfplumber_range,
+}
+
+
+def extract_page_range(file_path: str, start: int, end: int, engine: Optional[str] = None) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) and return (1-based page number, text) pairs. Runs in a worker."""
+    engine = engine or settings.pdf_extract_engine
+    extractor = EXTRACTION_ENGINES.get(engine)
+    if extractor is None:
+        raise ValueError(f"Unknown PDF extraction engine '{engine}' (expected one of {sorted(EXTRACTION_ENGINES)})")
+    return extractor(file_path, start, end)
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page of the PDF, in page order.
+    Small documents (one range) are extracted in-process; the pool's startup
+    and pickling overhead is not worth it there.
+    """
+    engine = settings.pdf_extract_engine
+    page_count = count_pages(file_path)
+    ranges = page_ranges(page_count, settings.pdf_extract_pages_per_task)
+    if len(ranges) <= 1 or not settings.pdf_extract_parallel:
+        for start, end in ranges:
+            yield from extract_page_range(file_path, start, end, engine)
+        return
+
+    pool = get_extraction_pool()
+    # Keep every worker busy with one range queued behind it, but don't extract far ahead of a slow consumer
+    max_in_flight = _worker_count() * 2
+    futures = deque()
+    submitted = 0
+    done = 0
+    try:
+        while done < len(ranges):
+            while submitted < len(ranges) and len(futures) < max_in_flight:
+                start, end = ranges[submitted]
+                futures.append(pool.submit(extract_page_range, file_path, start, end, engine))
+                submitted += 1
+            # Ranges run concurrently; waiting on them in submission order keeps output ordered
+            pages = futures.popleft().result()
+            done += 1
+            yield from pages
+    except BrokenProcessPool as e:
+        # A worker died (OOM, crash); replace the pool next time and finish this document in-process
+        logger.warning(f"PDF extraction pool failed ({e}); extracting remaining pages in-process")
+        _discard_pool(pool)
+        for start, end in ranges[done:]:
+            yield from extract_page_range(file_path, start, end, engine)
+    finally:
+        for future in futures:
+            future.cancel()
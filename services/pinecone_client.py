@@ -1,23 +1,124 @@
 # services/pinecone_client.py
+"""
+Shared Pinecone client.
+
+One `Pinecone` client and one `Index` handle per process, built on first use
+(not at import) and reused by every module, so all requests share one urllib3
+connection pool of PINECONE_POOL_MAXSIZE keep-alive connections. Sockets get
+TCP keep-alive probes so idle pooled connections aren't silently dropped by
+load balancers, and every data-plane call gets (PINECONE_CONNECT_TIMEOUT,
+PINECONE_READ_TIMEOUT) via `request_timeout()`.
+
+Setting PINECONE_INDEX_HOST skips the control-plane lookup of the index host.
+`warm_up()` (API and worker startup) builds the client and opens the first
+connection before the first user request needs it.
+"""
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
 from pinecone import Pinecone
+
 from config import settings
 from logger_config import logger
 
-# Initialize Pinecone
-pc = Pinecone(api_key=settings.pinecone_api_key)
-index = pc.Index(settings.pinecone_index_name)
+_client: Optional[Pinecone] = None
+_index = None
+_lock = threading.Lock()
+
+
+def request_timeout() -> Tuple[float, float]:
+    """(connect, read) timeout passed to Index calls as `_request_timeout`."""
+    return (settings.pinecone_connect_timeout, settings.pinecone_read_timeout)
+
+
+def _socket_options() -> List[tuple]:
+    # urllib3's default (TCP_NODELAY) plus keep-alive probes
+    options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+    if not settings.pinecone_keepalive:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options += [
+            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, settings.pinecone_keepalive_idle_seconds),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, settings.pinecone_keepalive_interval_seconds),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, settings.pinecone_keepalive_probes),
+        ]
+    elif hasattr(socket, "TCP_KEEPALIVE"):
+        # macOS: idle time only
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, settings.pinecone_keepalive_idle_seconds))
+    return options
+
+
+def get_client() -> Pinecone:
+    """The process-wide Pinecone client, created on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                kwargs: Dict[str, Any] = {"api_key": settings.pinecone_api_key}
+                if settings.pinecone_pool_threads > 0:
+                    kwargs["pool_threads"] = settings.pinecone_pool_threads
+                client = Pinecone(**kwargs)
+                openapi_config = getattr(client, "openapi_config", None)
+                if openapi_config is not None:
+                    # Copied into every Index built from this client
+                    openapi_config.socket_options = _socket_options()
+                _client = client
+                logger.info("Initialized Pinecone client")
+    return _client
+
 
 def get_index():
-    """Get the Pinecone index instance."""
-    return index
+    """The process-wide Index handle; raises if the index can't be reached (retried on the next call)."""
+    global _index
+    if _index is None:
+        client = get_client()
+        with _lock:
+            if _index is None:
+                kwargs: Dict[str, Any] = {"connection_pool_maxsize": max(1, settings.pinecone_pool_maxsize)}
+                if settings.pinecone_index_host:
+                    kwargs["host"] = settings.pinecone_index_host
+                else:
+                    kwargs["name"] = settings.pinecone_index_name
+                try:
+                    _index = client.Index(**kwargs)
+                except Exception as e:
+                    logger.error(f"Failed to connect to Pinecone index {settings.pinecone_index_name}: {e}")
+                    raise
+                logger.info(f"Connected to Pinecone index: {settings.pinecone_index_name}")
+    return _index
+
 
 def describe_index_stats():
     """Get statistics about the Pinecone index."""
+    if settings.vector_store_backend != "pinecone":
+        raise RuntimeError(f"Pinecone is not in use (VECTOR_STORE_BACKEND={settings.vector_store_backend})")
     try:
         logger.info("Getting Pinecone index statistics")
-        stats = index.describe_index_stats()
+        stats = get_index().describe_index_stats(_request_timeout=request_timeout())
         logger.info(f"Pinecone stats: {stats}")
         return stats
     except Exception as e:
         logger.error(f"Error getting Pinecone stats: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def warm_up() -> Optional[float]:
+    """
+    Build the client and index handle and make one cheap call so the host lookup,
+    TLS handshake and first pooled connection happen now. Returns seconds taken,
+    None when skipped or failed (the first real request retries).
+    """
+    if settings.vector_store_backend != "pinecone" or not settings.pinecone_warmup:
+        return None
+    start = time.perf_counter()
+    try:
+        get_index().describe_index_stats(_request_timeout=request_timeout())
+    except Exception as e:
+        logger.warning(f"Pinecone warm-up failed: {e}")
+        return None
+    elapsed = time.perf_counter() - start
+    logger.info(f"Pinecone client warmed up in {elapsed:.2f}s")
+    return elapsed
@@ -7,13 +7,29 @@
 # Index Name = voice-chat-index
 # Dimension = 1024
 # Metric = cosine
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from config import settings
 from datetime import datetime
-from db.database import SessionLocal, Document
+from db.database import SessionLocal, Document, DocumentChunk
 from sqlalchemy.orm import Session
 from logger_config import logger
-from pinecone import Pinecone
+from services.chunking import chunk_pages, chunk_text
+from services.context_builder import build_context
+from services.embedding_cache import get_embedding_cache
+from services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from services.jobs import JobProgress
+from services.pdf_extract import count_pages, iter_pdf_pages
+from services.pinecone_client import get_index, request_timeout
+from services.pipeline import run_pipeline
+from services.vector_store import create_vector_store
+from services.retrieval_cache import retrieval_cache
+from services.semantic_cache import semantic_cache
+from services.upsert_pipeline import upsert_in_batches
+from services.tokens import estimate_tokens
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import asyncio
+import hashlib
 import logging
 import os
 import uuid
@@ -22,31 +38,27 @@ logger = logging.getLogger(__name__)
 BASE_URL = settings.BASE_URL
 EMBEDDING_MODEL = "intfloat/e5-large-v2"  # or "intfloat/multilingual-e5-large"
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(settings.pinecone_index_name)
-
 # Connect to existing index (make sure env var is set)
 INDEX_NAME = settings.pinecone_index_name
 
 if not INDEX_NAME:
     raise RuntimeError("PINECONE_INDEX_NAME is not set in environment variables")
 
-try:
-    index = pc.Index(INDEX_NAME)
-    logger.info(f"Connected to Pinecone index: {INDEX_NAME}")
-except Exception as e:
-    logger.error(f"Failed to connect to Pinecone index: {e}")
-    index = None
+# All upserts/queries go through the configured backend (see services/vector_store.py).
+# The Pinecone index comes from the shared, lazily built client in services/pinecone_client.py.
+vector_store = create_vector_store(
+    settings.vector_store_backend,
+    pinecone_index_factory=get_index,
+    local_dir=settings.local_vector_store_dir,
+    local_dtype=settings.local_vector_dtype,
+    request_timeout=request_timeout(),
+)
 
 
 def describe_index_stats():
-    """Return Pinecone index stats in JSON-safe form."""
-    if index is None:
-        raise RuntimeError("Pinecone index is not initialized")
-
+    """Return vector index stats in JSON-safe form."""
     try:
-        stats = index.describe_index_stats()
+        stats = vector_store.describe_index_stats()
 
         # Convert to JSON-serializable
         def make_serializable(obj):
@@ -76,150 +88,489 @@ openai = OpenAI(
     base_url=BASE_URL,
 )
 
+# Async client used by the request path (aget_embedding / aretrieve_context)
+async_openai = AsyncOpenAI(
+    api_key=settings.llm_api_key,
+    base_url=BASE_URL,
+)
+
+
+def _extract_embedding(embeddings) -> list:
+    # robust extraction: some SDKs return dict or object
+    try:
+        embedding = embeddings.data[0].embedding
+    except Exception:
+        # try alternative shapes
+        if isinstance(embeddings, dict):
+            embedding = embeddings.get("data", [])[0].get("embedding")
+        else:
+            embedding = getattr(embeddings.data[0], "embedding", None)
+
+    if not embedding:
+        raise ValueError("Embedding returned empty from the API")
+
+    logger.info("Successfully generated embedding of length %d", len(embedding))
+    return list(embedding)
+
+
 def get_embedding(text: str) -> list:
     """
     Generate an embedding for the given text using DeepInfra via OpenAI-compatible client.
     NOTE: Don't pass 'dimensions' — the model determines the vector size.
     """
+    text = text or ""
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
     try:
-        text = text or ""
         logger.info("Generating embedding for text of length %d", len(text))
         embeddings = openai.embeddings.create(
             input=text,
             model=EMBEDDING_MODEL,
             encoding_format="float",
         )
-        # robust extraction: some SDKs return dict or object
-        try:
-            embedding = embeddings.data[0].embedding
-        except Exception:
-            # try alternative shapes
-            if isinstance(embeddings, dict):
-                embedding = embeddings.get("data", [])[0].get("embedding")
-            else:
-                embedding = getattr(embeddings.data[0], "embedding", None)
+        embedding = _extract_embedding(embeddings)
+        if cache is not None:
+            cache.put(EMBEDDING_MODEL, text, embedding)
+        return embedding
+    except Exception as e:
+        logger.exception("Error generating embedding: %s", e)
+        # Return a zero vector fallback matching your index dimension (1024)
+        return [0.0] * 1024
 
-        if not embedding:
-            raise ValueError("Embedding returned empty from the API")
 
-        logger.info("Successfully generated embedding of length %d", len(embedding))
-        return list(embedding)
+async def aget_embedding(text: str) -> list:
+    """Async variant of `get_embedding` using the AsyncOpenAI client."""
+    text = text or ""
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = cache.get(EMBEDDING_MODEL, text)
+        if cached is not None:
+            return cached
+    try:
+        logger.info("Generating embedding (async) for text of length %d", len(text))
+        embeddings = await async_openai.embeddings.create(
+            input=text,
+            model=EMBEDDING_MODEL,
+            encoding_format="float",
+        )
+        embedding = _extract_embedding(embeddings)
+        if cache is not None:
+            cache.put(EMBEDDING_MODEL, text, embedding)
+        return embedding
     except Exception as e:
         logger.exception("Error generating embedding: %s", e)
-        # Return a zero vector fallback matching your index dimension (1024)
         return [0.0] * 1024
 
 
-def retrieve_context(query: str, user_id: int, top_k: int = 3) -> str:
-    """
-    Retrieve relevant context from Pinecone based on the query and user_id.
-    Handles multiple Pinecone response shapes safely.
-    """
-    print("Getting user_id in retrieve function--> ", user_id)
-    logger.info("Retrieving context for user_id=%s query_len=%d", user_id, len(query or ""))
-    print("query--> ", query)
-    query_embedding = get_embedding(query)
-    # print("query_embedding in pinecone_service.py---> ", query_embedding)
-    print("user_id---> ", user_id)
+def _embedding_batches(texts: List[str]) -> List[List[str]]:
+    """Group texts into requests bounded by EMBEDDING_BATCH_SIZE inputs and EMBEDDING_BATCH_MAX_TOKENS."""
+    max_items = max(1, settings.embedding_batch_size)
+    max_tokens = max(1, settings.embedding_batch_max_tokens)
+    batches, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _embed_batch(batch: List[str]) -> List[list]:
     try:
-        resp = index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True,
-            filter={"user_id": {"$eq": user_id}},
+        response = openai.embeddings.create(
+            input=batch,
+            model=EMBEDDING_MODEL,
+            encoding_format="float",
         )
-        print()
-        print("getting resp in retrieve function---> ", resp)
-        print()
+        data = response.get("data", []) if isinstance(response, dict) else response.data
+        if len(data) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(data)}")
+        # Results carry their input position; don't rely on response ordering
+        ordered = sorted(data, key=lambda d: d.get("index", 0) if isinstance(d, dict) else d.index)
+        return [list(d.get("embedding") if isinstance(d, dict) else d.embedding) for d in ordered]
     except Exception as e:
-        logger.exception("Pinecone query failed: %s", e)
-        print("resp failed----")
-        return "Error retrieving context."
+        logger.warning("Batch embedding of %d inputs failed (%s); falling back to single requests", len(batch), e)
+        return [get_embedding(text) for text in batch]
+
+
+def get_embeddings(texts: List[str]) -> List[list]:
+    """
+    Embed many texts with as few API round-trips as possible.
+
+    Cached texts are served from the embedding cache; the remaining unique texts are
+    grouped into batched `embeddings.create` requests (see `_embedding_batches`) which
+    run with up to EMBEDDING_MAX_CONCURRENCY requests in flight. Results are returned
+    in input order.
+    """
+    texts = [text or "" for text in texts]
+    results: dict = {}
+    cache = get_embedding_cache()
+    pending = []
+    for text in dict.fromkeys(texts):
+        cached = cache.get(EMBEDDING_MODEL, text) if cache is not None else None
+        if cached is not None:
+            results[text] = cached
+        else:
+            pending.append(text)
+
+    if pending:
+        batches = _embedding_batches(pending)
+        logger.info("Embedding %d texts in %d batched requests (%d served from cache)",
+                    len(pending), len(batches), len(results))
+        workers = max(1, min(settings.embedding_max_concurrency, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch, embeddings in zip(batches, pool.map(_embed_batch, batches)):
+                for text, embedding in zip(batch, embeddings):
+                    results[text] = embedding
+                    if cache is not None and any(embedding):
+                        cache.put(EMBEDDING_MODEL, text, embedding)
+
+    return [results[text] for text in texts]
+
 
-    # Normalize matches
-    matches = []
+def per_user_namespace(user_id: int) -> str:
+    return f"{settings.vector_namespace_prefix}{int(user_id)}"
+
+
+def user_namespace(user_id: int) -> Optional[str]:
+    """
+    Namespace holding `user_id`'s vectors: "<VECTOR_NAMESPACE_PREFIX><user_id>" in
+    "user" mode, None (the shared default namespace) in "shared" mode.
+    """
+    if settings.vector_namespace_mode == "user":
+        return per_user_namespace(user_id)
+    return None
+
+
+def _query_index(query_embedding: list, user_id: int, top_k: int):
+    namespace = user_namespace(user_id)
+    return vector_store.query(
+        vector=query_embedding,
+        top_k=top_k,
+        include_metadata=True,
+        # A per-user namespace only holds that user's vectors; no filter, and the query only touches their corpus
+        filter=None if namespace else {"user_id": {"$eq": user_id}},
+        namespace=namespace,
+    )
+
+
+def _response_matches(resp) -> list:
+    """Match entries of a Pinecone query response (dict or object form), or the list itself."""
+    if isinstance(resp, list):
+        return resp
     if isinstance(resp, dict):
-        matches = resp.get("matches", []) or resp.get("results", [])
-    else:
-        # object form: try attributes
-        matches = getattr(resp, "matches", None) or getattr(resp, "results", None) or []
-
-    context_parts = []
-    for m in matches:
-        try:
-            # m can be dict or object; unify
-            meta = m.get("metadata") if isinstance(m, dict) else getattr(m, "metadata", None)
-            if not meta:
-                # some SDKs nest metadata differently
-                meta = m.get("meta") if isinstance(m, dict) else getattr(m, "meta", None)
-
-            text_chunk = None
-            if isinstance(meta, dict):
-                text_chunk = meta.get("text") or meta.get("original_text") or meta.get("content")
-            else:
-                text_chunk = getattr(meta, "text", None) if meta else None
+        return resp.get("matches", []) or resp.get("results", [])
+    # object form: try attributes
+    return getattr(resp, "matches", None) or getattr(resp, "results", None) or []
+
 
-            if text_chunk:
-                context_parts.append(text_chunk)
-        except Exception:
-            logger.debug("Failed to parse a match entry: %s", m)
+def _as_match(m) -> dict:
+    if isinstance(m, dict):
+        # some SDKs nest metadata differently
+        return {"id": m.get("id"), "score": m.get("score"), "metadata": m.get("metadata") or m.get("meta") or {}}
+    return {
+        "id": getattr(m, "id", None),
+        "score": getattr(m, "score", None),
+        "metadata": getattr(m, "metadata", None) or getattr(m, "meta", None) or {},
+    }
 
-    if not context_parts:
-        return "No relevant context found."
 
-    context = "\n".join(context_parts)
-    logger.info("Retrieved context length=%d", len(context))
+def _search(query: str, query_embedding: list, user_id: int, top_k: int) -> list:
+    """
+    Dense query, fused with BM25 matches from the local lexical index when hybrid
+    search is enabled. Both retrievers return HYBRID_CANDIDATES matches, merged by
+    weighted reciprocal rank and cut to `top_k`, so exact identifiers surface
+    without raising `top_k`. Fused matches keep the dense cosine as "similarity"
+    and mark BM25 hits with "lexical" and their query-term "coverage" for the
+    context builder's relevance threshold.
+    """
+    lexical = get_lexical_index()
+    if lexical is None:
+        return [_as_match(m) for m in _response_matches(_query_index(query_embedding, user_id, top_k))]
+    candidates = max(top_k, settings.hybrid_candidates)
+    dense = [_as_match(m) for m in _response_matches(_query_index(query_embedding, user_id, candidates))]
+    try:
+        lexical_matches = lexical.search(query, user_id, candidates)
+    except Exception as e:
+        logger.warning("Lexical search failed, using dense results only: %s", e)
+        lexical_matches = []
+    fused = reciprocal_rank_fusion(
+        [dense, lexical_matches],
+        [settings.hybrid_dense_weight, settings.hybrid_lexical_weight],
+        k=settings.hybrid_rrf_k,
+        limit=top_k,
+    )
+    similarity = {m["id"]: m["score"] for m in dense}
+    coverage = {m["id"]: m["coverage"] for m in lexical_matches}
+    for m in fused:
+        m["similarity"] = similarity.get(m["id"])
+        m["lexical"] = 1 in m["sources"]
+        m["coverage"] = coverage.get(m["id"], 0.0)
+    logger.info("Hybrid retrieval: %d dense + %d lexical candidates -> %d", len(dense), len(lexical_matches), len(fused))
+    return fused
+
+
+def _matches_to_context(matches: list, top_k: int) -> str:
+    """Relevant, de-duplicated chunks packed into the context token budget; "" when nothing is relevant."""
+    context = build_context(matches, max_chunks=top_k)
+    logger.info("Retrieved context: %d candidates -> length=%d", len(matches), len(context))
     return context
 
 
-def index_document(file_path: str, document_id: int, user_id: int, db: Session) -> None:
+def retrieve_context(query: str, user_id: int, top_k: int = 3, query_embedding: Optional[list] = None) -> str:
     """
-    Parse a PDF document, generate embeddings for each page, and store in Pinecone.
+    Retrieve relevant context from Pinecone based on the query and user_id,
+    fused with BM25 matches when hybrid search is enabled (see `_search`).
+
+    CONTEXT_CANDIDATES matches are fetched and at most `top_k` chunks kept: matches
+    below CONTEXT_MIN_SCORE are dropped, near-duplicates removed (MMR) and the rest
+    packed into CONTEXT_MAX_TOKENS (see services/context_builder.py). Returns ""
+    when nothing is relevant or the query fails, so no context is sent to the LLM.
+
+    Repeated queries are served from the retrieval cache until the user's vectors change.
+    Pass `query_embedding` when the caller already embedded `query`.
+    """
+    logger.info("Retrieving context for user_id=%s query_len=%d", user_id, len(query or ""))
+    generation = retrieval_cache.generation(user_id)
+    cached = retrieval_cache.get(user_id, query, top_k)
+    if cached is not None:
+        logger.info("Retrieval cache hit for user_id=%s", user_id)
+        return cached
+    if query_embedding is None:
+        query_embedding = get_embedding(query)
+    try:
+        matches = _search(query, query_embedding, user_id, max(top_k, settings.context_candidates))
+    except Exception as e:
+        # Answer without context rather than fail the turn; not cached, the next call retries
+        logger.exception("Pinecone query failed, continuing without context: %s", e)
+        return ""
+    context = _matches_to_context(matches, top_k)
+    retrieval_cache.set(user_id, query, top_k, context, generation)
+    return context
+
+
+async def aretrieve_context(query: str, user_id: int, top_k: int = 3, query_embedding: Optional[list] = None) -> str:
+    """
+    Async variant of `retrieve_context`: embeds with the async client and runs the
+    Pinecone query in a worker thread so the event loop stays free. `query_embedding`
+    skips the embedding call when the caller already has it.
+    """
+    logger.info("Retrieving context (async) for user_id=%s query_len=%d", user_id, len(query or ""))
+    generation = retrieval_cache.generation(user_id)
+    cached = retrieval_cache.get(user_id, query, top_k)
+    if cached is not None:
+        logger.info("Retrieval cache hit for user_id=%s", user_id)
+        return cached
+    if query_embedding is None:
+        query_embedding = await aget_embedding(query)
+    try:
+        matches = await asyncio.to_thread(_search, query, query_embedding, user_id, max(top_k, settings.context_candidates))
+    except Exception as e:
+        # Answer without context rather than fail the turn; not cached, the next call retries
+        logger.exception("Pinecone query failed, continuing without context: %s", e)
+        return ""
+    context = _matches_to_context(matches, top_k)
+    retrieval_cache.set(user_id, query, top_k, context, generation)
+    return context
+
+
+def _chunk_vector_id(document_id: int, chunk_hash: str, occurrence: int) -> str:
+    # Derived from content, so an unchanged chunk keeps its vector id across re-indexing
+    vector_id = f"doc_{document_id}_{chunk_hash[:16]}"
+    return f"{vector_id}_{occurrence}" if occurrence else vector_id
+
+
+def _purge_legacy_vectors(document_id: int, user_id: int) -> None:
+    """Vectors written before chunk fingerprints existed have positional ids; remove them by metadata."""
+    try:
+        vector_store.delete(filter={'document_id': {'$eq': document_id}}, namespace=user_namespace(user_id))
+        retrieval_cache.bump(user_id)
+        lexical = get_lexical_index()
+        if lexical is not None:
+            lexical.delete_document(document_id)
+        logger.info(f"Removed pre-fingerprint vectors of document {document_id}")
+    except Exception as e:
+        # Serverless Pinecone indexes do not support delete-by-filter
+        logger.warning(f"Could not remove pre-fingerprint vectors of document {document_id}: {e}")
+
+
+def index_document(file_path: str, document_id: int, user_id: int, db: Session,
+                   progress: Optional[JobProgress] = None) -> None:
+    """
+    Parse a PDF document, split it into token-bounded chunks, generate embeddings
+    and store in Pinecone.
+
+    Extraction/chunking, embedding and upsert run as a pipeline (services/pipeline.py):
+    each stage has its own thread and hands batches to the next through a bounded
+    queue, so pages are extracted while the previous batch is embedded and the one
+    before that is upserted. Fingerprints and progress are written from this thread.
+
+    Re-indexing is incremental: every chunk's sha256 is recorded in document_chunks,
+    chunks whose text is unchanged keep their vector (no embedding call, no upsert)
+    and vectors of chunks that no longer appear are deleted.
+
+    `progress` (set by the indexing worker) receives page/chunk counters and the
+    time spent extracting, embedding and upserting. Stages overlap, so their
+    times add up to more than the wall time.
     """
     logger.info(f"Indexing document {file_path} for user_id {user_id}")
+    progress = progress or JobProgress()
     
     try:
-        # Import here to avoid circular imports
-        import pdfplumber
-        
-        # Extract text from PDF
-        text_chunks = []
-        with pdfplumber.open(file_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text:
-                    text_chunks.append(text)
-                    logger.debug(f"Extracted {len(text)} characters from page {i+1}")
-        
-        logger.info(f"Extracted {len(text_chunks)} text chunks from PDF")
-        
-        if not text_chunks:
-            logger.warning(f"No text extracted from document {file_path}")
-            return
-        
-        # Generate embeddings for each chunk and upsert to Pinecone
-        vectors = []
-        for i, chunk in enumerate(text_chunks):
-            logger.debug(f"Processing chunk {i+1}/{len(text_chunks)} of length {len(chunk)}")
-            embedding = get_embedding(chunk)
-            vectors.append({
-                'id': f"doc_{document_id}_chunk_{i}",
-                'values': embedding,
-                'metadata': {
-                    'document_id': document_id,
-                    'user_id': user_id,  # Add user_id to metadata
-                    'chunk_index': i,
-                    'text': chunk
+        known = {
+            row.vector_id: row.chunk_hash
+            for row in db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id)
+        }
+        if not known:
+            previous = db.query(Document.indexed_at).filter(Document.id == document_id).scalar()
+            if previous is not None:
+                _purge_legacy_vectors(document_id, user_id)
+
+        namespace = user_namespace(user_id)
+        lexical = get_lexical_index()
+        # Documents indexed before the lexical index existed: add their unchanged chunks to it too
+        lexical_backfill = bool(known) and lexical is not None and not lexical.has_document(document_id)
+        chunk_count = 0
+        embedded = 0
+        seen = set()
+        # Enough chunks per batch to keep both the concurrent embedding requests and the concurrent upserts busy
+        batch_size = max(
+            settings.embedding_batch_size * max(1, settings.embedding_max_concurrency),
+            settings.upsert_batch_size * max(1, settings.upsert_max_concurrency),
+        )
+
+        def chunk_metadata(item):
+            return {
+                'document_id': document_id,
+                'user_id': user_id,  # Add user_id to metadata
+                'chunk_index': item['chunk_index'],
+                'page_start': item['page_start'],
+                'page_end': item['page_end'],
+                'text': item['text']
+            }
+
+        def counted(pages):
+            for page in pages:
+                progress.add(pages_processed=1)
+                yield page
+
+        def changed_chunks():
+            """Stage 1 (source): extract and chunk pages, yield batches of new/changed chunks."""
+            nonlocal chunk_count
+            occurrences: dict = {}
+            batch = []
+            backfill = []
+            # Extract text from PDF (process pool, page order preserved) and chunk it as pages arrive
+            chunks = chunk_pages(counted(iter_pdf_pages(file_path)))
+            while True:
+                with progress.stage_timer("extracting"):
+                    item = next(chunks, None)
+                if item is None:
+                    break
+                chunk, page_start, page_end = item
+                chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+                occurrence = occurrences.get(chunk_hash, 0)
+                occurrences[chunk_hash] = occurrence + 1
+                vector_id = _chunk_vector_id(document_id, chunk_hash, occurrence)
+                seen.add(vector_id)
+                chunk_count += 1
+                item = {
+                    'vector_id': vector_id,
+                    'chunk_hash': chunk_hash,
+                    'chunk_index': chunk_count - 1,
+                    'page_start': page_start,
+                    'page_end': page_end,
+                    'text': chunk,
                 }
-            })
+                if vector_id in known:
+                    progress.add(chunks_processed=1, chunks_unchanged=1)
+                    if lexical_backfill:
+                        backfill.append({'id': vector_id, 'metadata': chunk_metadata(item)})
+                        if len(backfill) >= batch_size:
+                            lexical.upsert(backfill)
+                            backfill = []
+                    continue
+                progress.add(chunks_processed=1)
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if backfill:
+                lexical.upsert(backfill)
+            if batch:
+                yield batch
+
+        def embed(batch):
+            """Stage 2: embed a batch."""
+            with progress.stage_timer("embedding"):
+                embeddings = get_embeddings([item['text'] for item in batch])
+            failed = sum(1 for embedding in embeddings if not any(embedding))
+            if failed:
+                # get_embedding's zero-vector fallback: storing it (and its fingerprint) would mark the
+                # chunk as indexed for good; fail so the job retry re-embeds it
+                raise RuntimeError(f"Embedding failed for {failed} of {len(batch)} chunks of document {document_id}")
+            return batch, embeddings
+
+        def upsert(embedded_batch):
+            """Stage 3: upsert a batch's vectors."""
+            batch, embeddings = embedded_batch
+            vectors = [
+                {'id': item['vector_id'], 'values': embedding, 'metadata': chunk_metadata(item)}
+                for item, embedding in zip(batch, embeddings)
+            ]
+            with progress.stage_timer("upserting"):
+                upsert_in_batches(vector_store, vectors, namespace=namespace)
+                if lexical is not None:
+                    lexical.upsert(vectors)
+            retrieval_cache.bump(user_id)
+            return batch
+
+        progress.set(pages_total=count_pages(file_path))
+        for batch in run_pipeline(changed_chunks(), [embed, upsert], name=f"index-doc{document_id}"):
+            # Record fingerprints only once the vectors are stored, so a retried job re-sends anything lost
+            db.add_all([
+                DocumentChunk(
+                    document_id=document_id,
+                    chunk_hash=item['chunk_hash'],
+                    vector_id=item['vector_id'],
+                    chunk_index=item['chunk_index'],
+                )
+                for item in batch
+            ])
+            db.commit()
+            embedded += len(batch)
+            progress.add(chunks_embedded=len(batch), vectors_upserted=len(batch))
         
-        # Upsert to Pinecone
-        if vectors:
-            logger.info(f"Upserting {len(vectors)} vectors to Pinecone")
-            response = index.upsert(vectors)
-            logger.info(f"Pinecone upsert response: {response}")
-        else:
-            logger.warning("No vectors to upsert to Pinecone")
+        if not chunk_count:
+            logger.warning(f"No text extracted from document {file_path}")
+            raise ValueError(f"No text could be extracted from {os.path.basename(file_path)}")
+
+        stale = sorted(set(known) - seen)
+        if stale:
+            # Pinecone accepts at most 1000 ids per delete
+            with progress.stage_timer("upserting"):
+                for i in range(0, len(stale), 1000):
+                    vector_store.delete(ids=stale[i:i + 1000], namespace=namespace)
+                if lexical is not None:
+                    lexical.delete(stale)
+            retrieval_cache.bump(user_id)
+            db.query(DocumentChunk).filter(
+                DocumentChunk.document_id == document_id,
+                DocumentChunk.vector_id.in_(stale),
+            ).delete(synchronize_session=False)
+            db.commit()
+
+        logger.info(
+            f"Document {document_id}: {chunk_count} chunks, {embedded} embedded, "
+            f"{chunk_count - embedded} unchanged, {len(stale)} removed"
+        )
         
         # Update the document record in the database to mark as indexed
         document = db.query(Document).filter(Document.id == document_id).first()
@@ -228,11 +579,15 @@ def index_document(file_path: str, document_id: int, user_id: int, db: Session)
             document.indexed_at = datetime.utcnow()
             db.commit()
             logger.info(f"Updated document {document_id} as indexed")
+
+        # The user's document set changed; cached answers may no longer be right
+        semantic_cache.invalidate_user(user_id)
+        retrieval_cache.bump(user_id)
             
     except Exception as e:
+        # Re-raised so the indexing job is retried / marked failed instead of silently staying unindexed
         logger.error(f"Error indexing document {file_path}: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        raise
 
 
 def index_transcript(user_id: int, transcript: str, chat_id: int = None):
@@ -248,24 +603,14 @@ def index_transcript(user_id: int, transcript: str, chat_id: int = None):
             logger.info("index_transcript called with empty transcript; skipping")
             return
 
-        # simple chunking by sentences / size; keep chunks <= ~2000 chars
-        chunks = []
-        cur = []
-        for part in transcript.replace('\r', '\n').split('\n'):
-            part = part.strip()
-            if not part:
-                continue
-            if sum(len(p) for p in cur) + len(part) + 1 > 1800:
-                chunks.append(' '.join(cur))
-                cur = [part]
-            else:
-                cur.append(part)
-        if cur:
-            chunks.append(' '.join(cur))
+        # token-bounded, sentence-aligned chunks with overlap (see services/chunking.py)
+        chunks = chunk_text(transcript)
 
         vectors = []
-        for i, chunk in enumerate(chunks):
-            emb = get_embedding(chunk)
+        for i, (chunk, emb) in enumerate(zip(chunks, get_embeddings(chunks))):
+            if not any(emb):
+                logger.warning(f"Skipping transcript chunk {i} of chat {chat_id}: embedding failed")
+                continue
             vid = f"chat_{chat_id or 'anon'}_chunk_{i}_{uuid.uuid4().hex[:8]}"
             vectors.append({
                 'id': vid,
@@ -281,11 +626,26 @@ def index_transcript(user_id: int, transcript: str, chat_id: int = None):
 
         if vectors:
             logger.info(f"Upserting {len(vectors)} transcript vectors for user {user_id}")
-            resp = index.upsert(vectors)
-            logger.info(f"index_transcript upsert response: {resp}")
+            upsert_in_batches(vector_store, vectors, namespace=user_namespace(user_id))
+            lexical = get_lexical_index()
+            if lexical is not None:
+                lexical.upsert(vectors)
+            retrieval_cache.bump(user_id)
     except Exception as e:
         logger.exception("Failed to index transcript: %s", e)
         raise
 
 
-        
\ No newline at end of file
+def delete_user_vectors(user_id: int) -> None:
+    """Remove every vector of `user_id`: drops their namespace in "user" mode, a filter delete otherwise."""
+    namespace = user_namespace(user_id)
+    if namespace:
+        vector_store.delete_namespace(namespace)
+    else:
+        vector_store.delete(filter={'user_id': {'$eq': int(user_id)}})
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.delete_user(user_id)
+    semantic_cache.invalidate_user(user_id)
+    retrieval_cache.bump(user_id)
+    logger.info(f"Deleted vectors of user {user_id}")
@@ -0,0 +1,100 @@
+# services/pipeline.py
+"""
+Thread-per-stage pipelines with bounded queues.
+
+`run_pipeline(source, stages)` iterates `source` in one thread and runs each
+stage function in its own thread, connected by queues of PIPELINE_QUEUE_SIZE
+items. Every stage works on its next item while the following stage is still
+busy with the previous one, and a full queue makes a fast stage wait for the
+slow one instead of piling up work in memory. Results come out of the returned
+iterator in source order on the caller's thread, so the caller can keep
+non-thread-safe resources (a DB session) to itself.
+
+The first error in any stage stops the pipeline and is re-raised to the caller.
+"""
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from config import settings
+
+_END = object()
+_POLL_SECONDS = 0.1
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(out: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _feed(source: Iterable, out: queue.Queue, stop: threading.Event) -> None:
+    iterator = iter(source)
+    try:
+        for item in iterator:
+            if not _put(out, item, stop):
+                break
+        else:
+            _put(out, _END, stop)
+    except BaseException as e:
+        _put(out, _Failure(e), stop)
+    finally:
+        # Stopped early: let a generator source release what it holds (pool futures, files)
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def _work(fn: Callable, inbox: queue.Queue, out: queue.Queue, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            item = inbox.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            continue
+        if item is _END or isinstance(item, _Failure):
+            _put(out, item, stop)
+            return
+        try:
+            result = fn(item)
+        except BaseException as e:
+            _put(out, _Failure(e), stop)
+            return
+        if not _put(out, result, stop):
+            return
+
+
+def run_pipeline(source: Iterable, stages: Sequence[Callable], queue_size: Optional[int] = None,
+                 name: str = "pipeline") -> Iterator:
+    """Yield `stages[-1](...stages[0](item))` for every item of `source`, each stage on its own thread."""
+    queue_size = max(1, queue_size or settings.pipeline_queue_size)
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_feed, args=(source, queues[0], stop), name=f"{name}-source", daemon=True)]
+    for i, fn in enumerate(stages):
+        threads.append(threading.Thread(
+            target=_work, args=(fn, queues[i], queues[i + 1], stop), name=f"{name}-stage{i + 1}", daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            # A stage stuck in a slow call finishes it on its own; don't hold the caller up for long
+            thread.join(timeout=5)
@@ -0,0 +1,70 @@
+# services/retrieval_cache.py
+"""
+Per-user retrieval result cache.
+
+Follow-ups and retries often repeat the same query within seconds. Contexts
+built by retrieve_context are cached for RETRIEVAL_CACHE_TTL_SECONDS under
+(user, generation, normalized query, top_k). Every upsert or delete for a user
+bumps that user's generation, so entries written before it are never served
+again; they simply age out of the LRU.
+
+Writes made by other processes (standalone indexing workers) are picked up by
+the completion watcher in services/indexing_worker.py, which bumps the same
+generations from the job table. The short TTL bounds anything in between.
+"""
+import re
+import threading
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.cache import TTLCache
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, surrounding whitespace/punctuation and internal spacing don't change what is retrieved."""
+    return _SPACE_RE.sub(" ", (query or "").lower()).strip(" \t.,;:!?\"'")
+
+
+class RetrievalCache:
+    def __init__(self, max_items: int = 10000, ttl_seconds: float = 30, enabled: bool = True):
+        self.enabled = enabled
+        self._entries = TTLCache(maxsize=max_items, ttl=ttl_seconds)
+        self._generations: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self.bumps = 0
+
+    def generation(self, user_id) -> int:
+        """Capture before retrieving; the result is stored under it (see `set`)."""
+        return self._generations.get(user_id, 0)
+
+    def bump(self, user_id) -> None:
+        """The user's vectors changed: cached results from before now are unreachable."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.bumps += 1
+
+    def _key(self, user_id, query: str, top_k: int, generation: int) -> tuple:
+        return (user_id, generation, normalize_query(query), top_k)
+
+    def get(self, user_id, query: str, top_k: int) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return self._entries.get(self._key(user_id, query, top_k, self.generation(user_id)))
+
+    def set(self, user_id, query: str, top_k: int, context: str, generation: int) -> None:
+        # Stored under the generation seen when retrieval started: if an upsert landed
+        # meanwhile, the entry is keyed to the old generation and never read
+        if self.enabled:
+            self._entries.set(self._key(user_id, query, top_k, generation), context)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "generation_bumps": self.bumps, **self._entries.stats()}
+
+
+retrieval_cache = RetrievalCache(
+    max_items=settings.retrieval_cache_max_items,
+    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+    enabled=settings.retrieval_cache_enabled,
+)
@@ -0,0 +1,145 @@
+# services/semantic_cache.py
+"""
+Per-user semantic response cache.
+
+Stores (query embedding, answer) pairs per user. A new query whose embedding is
+within SEMANTIC_CACHE_THRESHOLD cosine similarity of a cached one gets the cached
+answer, as long as the user's document set has not changed since it was stored
+(`invalidate_user` is called when indexing a document completes).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import settings
+from logger_config import logger
+
+
+class _UserEntries:
+    def __init__(self):
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (unit vector, answer, created_at)
+        self.matrix: Optional[np.ndarray] = None
+        self.matrix_ids: list = []
+        self.next_id = 0
+
+    def rebuild(self):
+        self.matrix_ids = list(self.entries)
+        self.matrix = np.stack([self.entries[i][0] for i in self.matrix_ids]) if self.matrix_ids else None
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.95, max_entries_per_user: int = 256,
+                 max_users: int = 10000, ttl_seconds: int = 24 * 3600, enabled: bool = True):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.max_entries_per_user = max(1, max_entries_per_user)
+        self.max_users = max(1, max_users)
+        self.ttl_seconds = ttl_seconds
+        self._users: "OrderedDict[Any, _UserEntries]" = OrderedDict()
+        # Bumped on invalidation so answers generated before a document change are not stored after it
+        self._generations: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(embedding) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if not norm:
+            # zero vectors are the embedding-failure fallback; never match on them
+            return None
+        return vec / norm
+
+    def lookup(self, user_id, embedding) -> Optional[str]:
+        if not self.enabled:
+            return None
+        vec = self._unit(embedding)
+        with self._lock:
+            user = self._users.get(user_id)
+            if vec is None or user is None or not user.entries:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            if user.matrix is None or user.matrix.shape[1] != vec.shape[0]:
+                self.misses += 1
+                return None
+            scores = user.matrix @ vec
+            best = int(np.argmax(scores))
+            entry_id = user.matrix_ids[best]
+            entry = user.entries.get(entry_id)
+            if entry is None or scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            if self.ttl_seconds and time.time() - entry[2] > self.ttl_seconds:
+                del user.entries[entry_id]
+                user.rebuild()
+                self.misses += 1
+                return None
+            user.entries.move_to_end(entry_id)
+            self.hits += 1
+        logger.info("Semantic cache hit for user %s (similarity=%.4f)", user_id, float(scores[best]))
+        return entry[1]
+
+    def generation(self, user_id) -> int:
+        """Capture before generating an answer; pass to `store` to discard it if invalidated meanwhile."""
+        return self._generations.get(user_id, 0)
+
+    def store(self, user_id, embedding, answer: str, generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        vec = self._unit(embedding)
+        if vec is None or not answer:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                return
+            user = self._users.get(user_id)
+            if user is None:
+                user = _UserEntries()
+                self._users[user_id] = user
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._users.move_to_end(user_id)
+            user.entries[user.next_id] = (vec, answer, time.time())
+            user.next_id += 1
+            while len(user.entries) > self.max_entries_per_user:
+                user.entries.popitem(last=False)
+            user.rebuild()
+            self.stores += 1
+
+    def invalidate_user(self, user_id) -> None:
+        """Drop every cached answer for a user (their document set changed)."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._users.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "users": len(self._users),
+                "entries": sum(len(u.entries) for u in self._users.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+semantic_cache = SemanticCache(
+    threshold=settings.semantic_cache_threshold,
+    max_entries_per_user=settings.semantic_cache_max_entries_per_user,
+    max_users=settings.semantic_cache_max_users,
+    ttl_seconds=settings.semantic_cache_ttl_seconds,
+    enabled=settings.semantic_cache_enabled,
+)
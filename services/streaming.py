@@ -1,3 +1,4 @@
+import asyncio
 import os
 import urllib.parse
 import uuid
@@ -10,11 +11,11 @@ from fastapi import WebSocket, WebSocketDisconnect
 
 from config import settings
 from logger_config import logger
-from services.stt import transcribe_audio
-from services.tts import generate_speech
-from services.pinecone_service import retrieve_context, index_transcript
-from services.llm import generate_response
-from db.database import SessionLocal, get_or_create_user_by_external_id, Chat
+from services.stt import atranscribe_audio
+from services.tts import agenerate_speech
+from services.pinecone_service import index_transcript
+from services.answer import aanswer
+from db.database import AsyncSessionLocal, aget_or_create_user_by_external_id, Chat
 from datetime import datetime
 
 # Simple in-memory concurrency map: user_id -> active_stream_count
@@ -43,8 +44,8 @@ async def websocket_stream(websocket: WebSocket):
     # Resolve external user id to DB id using a short-lived session
     try:
         external_user_id = user_id_param
-        with SessionLocal() as s:
-            db_user_id = get_or_create_user_by_external_id(s, external_user_id)
+        async with AsyncSessionLocal() as s:
+            db_user_id = await aget_or_create_user_by_external_id(s, external_user_id)
     except Exception:
         db_user_id = 0
 
@@ -135,16 +136,20 @@ async def websocket_stream(websocket: WebSocket):
                 ffmpeg_path = shutil.which('ffmpeg')
                 if ffmpeg_path:
                     cmd = [ffmpeg_path, '-y', '-i', stream_path, '-ar', '16000', '-ac', '1', wav_path]
-                    subprocess.run(cmd, check=True)
+                    await asyncio.to_thread(subprocess.run, cmd, check=True)
                     converted_path = wav_path
                     logger.info(f"Converted stream to WAV via ffmpeg: {wav_path}")
                 else:
                     # Try pydub fallback (pydub uses ffmpeg under the hood if available)
                     from pydub import AudioSegment
-                    audio = AudioSegment.from_file(stream_path)
-                    audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
                     wav_path = stream_path + ".wav"
-                    audio.export(wav_path, format='wav')
+
+                    def _convert():
+                        audio = AudioSegment.from_file(stream_path)
+                        audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+                        audio.export(wav_path, format='wav')
+
+                    await asyncio.to_thread(_convert)
                     converted_path = wav_path
                     logger.info(f"Converted stream to WAV via pydub: {wav_path}")
 
@@ -153,27 +158,26 @@ async def websocket_stream(websocket: WebSocket):
             # proceed and hope transcribe_audio can handle the original
 
         logger.info("Running transcription on streamed audio")
-        transcription = transcribe_audio(converted_path)
+        transcription = await atranscribe_audio(converted_path)
         logger.info(f"WebSocket transcription: {transcription}")
 
         # Persist the transcript as a Chat row and schedule indexing
         try:
-            with SessionLocal() as s:
+            async with AsyncSessionLocal() as s:
                 chat = Chat(user_id=user_id, message=transcription, response=None, timestamp=datetime.utcnow())
                 s.add(chat)
-                s.commit()
-                s.refresh(chat)
+                await s.commit()
+                await s.refresh(chat)
                 # schedule background indexing
                 try:
-                    index_transcript(user_id, transcription, chat.id)
+                    await asyncio.to_thread(index_transcript, user_id, transcription, chat.id)
                 except Exception:
                     logger.exception("Background indexing (websocket) failed; continuing")
         except Exception:
             logger.exception("Failed to persist chat from websocket stream")
 
         # Retrieve context and generate LLM response using canonical db id
-        context = retrieve_context(transcription, user_id)
-        response_text = generate_response(transcription, context)
+        response_text = await aanswer(transcription, user_id)
 
         # Optionally generate TTS
         audio_url = None
@@ -182,7 +186,7 @@ async def websocket_stream(websocket: WebSocket):
             audio_dir = os.path.join(settings.assets_dir, "audio")
             os.makedirs(audio_dir, exist_ok=True)
             audio_response_path = os.path.join(audio_dir, response_filename)
-            generate_speech(response_text, audio_response_path)
+            await agenerate_speech(response_text, audio_response_path)
             if os.path.exists(audio_response_path):
                 rel_path = os.path.relpath(audio_response_path, settings.assets_dir).replace("\\", "/")
                 # rel_path already contains the 'audio/...' segment, so don't duplicate it
@@ -1,43 +1,62 @@
 # services/stt.py
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from config import settings
 from logger_config import logger
 from pydub import AudioSegment
+import asyncio
 import tempfile
 import os
 
+STT_MODEL = "mistralai/Voxtral-Small-24B-2507"
+
 stt_client = OpenAI(
     api_key=settings.stt_api_key,
     base_url=settings.BASE_URL,
 )
 
+async_stt_client = AsyncOpenAI(
+    api_key=settings.stt_api_key,
+    base_url=settings.BASE_URL,
+)
+
+
+def _convert_for_transcription(file_path: str) -> str:
+    """Convert audio to 16kHz mono 16-bit WAV in a temp file and return its path."""
+    # Load audio with pydub and convert
+    logger.info("Loading and converting audio for transcription...")
+    audio = AudioSegment.from_file(file_path)
+
+    # Convert to 16kHz, mono, 16-bit PCM
+    audio = audio.set_frame_rate(16000)
+    audio = audio.set_channels(1)  # Mono
+    audio = audio.set_sample_width(2)  # 16-bit
+
+    # Export to temp WAV file
+    temp_input = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
+    temp_input.close()
+    try:
+        audio.export(temp_input.name, format="wav", parameters=["-bitexact"])
+    except Exception:
+        os.unlink(temp_input.name)
+        raise
+
+    logger.info(f"Converted audio saved to temp file: {temp_input.name}")
+    return temp_input.name
+
+
 def transcribe_audio(file_path: str) -> str:
     """Transcribe audio file to text using DeepInfra's API with format conversion."""
     logger.info(f"Transcribing audio file: {file_path}")
 
     # Create a safe temp file
-    temp_input = None
+    temp_path = None
     try:
-        # Load audio with pydub and convert
-        logger.info("Loading and converting audio for transcription...")
-        audio = AudioSegment.from_file(file_path)
-
-        # Convert to 16kHz, mono, 16-bit PCM
-        audio = audio.set_frame_rate(16000)
-        audio = audio.set_channels(1)  # Mono
-        audio = audio.set_sample_width(2)  # 16-bit
-
-        # Export to temp WAV file
-        temp_input = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-        temp_input.close()
-        audio.export(temp_input.name, format="wav", parameters=["-bitexact"])
-
-        logger.info(f"Converted audio saved to temp file: {temp_input.name}")
+        temp_path = _convert_for_transcription(file_path)
 
         # Transcribe the converted file
-        with open(temp_input.name, "rb") as f:
+        with open(temp_path, "rb") as f:
             transcript = stt_client.audio.transcriptions.create(
-                model="mistralai/Voxtral-Small-24B-2507",
+                model=STT_MODEL,
                 file=f
             )
 
@@ -50,5 +69,34 @@ def transcribe_audio(file_path: str) -> str:
         raise
     finally:
         # Clean up temp file
-        if temp_input and os.path.exists(temp_input.name):
-            os.unlink(temp_input.name)
\ No newline at end of file
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+async def atranscribe_audio(file_path: str) -> str:
+    """
+    Async variant of `transcribe_audio`: the ffmpeg/pydub conversion runs in a
+    worker thread and the API call goes through the AsyncOpenAI client.
+    """
+    logger.info(f"Transcribing audio file (async): {file_path}")
+
+    temp_path = None
+    try:
+        temp_path = await asyncio.to_thread(_convert_for_transcription, file_path)
+
+        with open(temp_path, "rb") as f:
+            transcript = await async_stt_client.audio.transcriptions.create(
+                model=STT_MODEL,
+                file=f
+            )
+
+        transcription = transcript.text
+        logger.info(f"Transcription result: {transcription}")
+        return transcription
+
+    except Exception as e:
+        logger.error(f"Error during transcription: {e}")
+        raise
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
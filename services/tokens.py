@@ -0,0 +1,22 @@
+# services/tokens.py
+import math
+import re
+
+# Words and individual punctuation marks, roughly how WordPiece/BPE tokenizers split text
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Average characters per sub-word piece for long words; errs on the side of over-counting
+_CHARS_PER_PIECE = 5
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, conservative token count for embedding/LLM inputs without loading a tokenizer.
+    Long words are counted as several sub-word pieces, punctuation as one token each.
+    """
+    if not text:
+        return 0
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        count += max(1, math.ceil(len(match.group(0)) / _CHARS_PER_PIECE))
+    return count
@@ -1,6 +1,6 @@
 # services/tts.py
 from pathlib import Path
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from config import settings
 from logger_config import logger  # Import the logger
 
@@ -10,6 +10,11 @@ tts_client = OpenAI(
     base_url=settings.BASE_URL,
 )
 
+async_tts_client = AsyncOpenAI(
+    api_key=settings.llm_api_key,
+    base_url=settings.BASE_URL,
+)
+
 MODEL = "hexgrad/Kokoro-82M"
 AI_VOICE = "af_bella"
 RESPONSE_FORMAT = "wav"
@@ -32,4 +37,25 @@ def generate_speech(user_text: str, output_path: str) -> str:
         return str(speech_file_path)
     except Exception as e:
         logger.error(f"Error generating speech: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+async def agenerate_speech(user_text: str, output_path: str) -> str:
+    """Async variant of `generate_speech`; streams the audio to disk via the AsyncOpenAI client."""
+    logger.info(f"Generating speech (async) for text: {user_text[:50]}...")
+
+    try:
+        speech_file_path = Path(output_path)
+        async with async_tts_client.audio.speech.with_streaming_response.create(
+            model=MODEL,
+            voice=AI_VOICE,
+            input=user_text,
+            response_format=RESPONSE_FORMAT,
+        ) as response:
+            await response.stream_to_file(speech_file_path)
+
+        logger.info(f"Speech generated and saved to: {speech_file_path}")
+        return str(speech_file_path)
+    except Exception as e:
+        logger.error(f"Error generating speech: {e}")
+        raise
@@ -0,0 +1,108 @@
+# services/upsert_pipeline.py
+"""
+Size-aware, concurrent batched upserts.
+
+Pinecone rejects upsert requests over 2 MB or 1000 vectors, and one huge
+request fails all-or-nothing. `upsert_in_batches` splits vectors into batches
+bounded by UPSERT_BATCH_SIZE and UPSERT_BATCH_MAX_BYTES, sends up to
+UPSERT_MAX_CONCURRENCY of them at once, retries each failed batch on its own
+with exponential backoff and reports throughput. Batch latencies are recorded
+in the "upsert.batch" histogram.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from logger_config import logger
+from services.metrics import timed
+
+# JSON floats are up to ~20 characters ("-0.012345678901234567,"); err high so batches stay under the limit
+_BYTES_PER_VALUE = 20
+_VECTOR_OVERHEAD_BYTES = 64
+
+
+def vector_payload_bytes(vector: Dict[str, Any]) -> int:
+    """Conservative estimate of a vector's size in an upsert request body."""
+    metadata = vector.get("metadata") or {}
+    return (
+        _VECTOR_OVERHEAD_BYTES
+        + len(str(vector.get("id", "")))
+        + _BYTES_PER_VALUE * len(vector.get("values") or [])
+        + len(json.dumps(metadata, default=str))
+    )
+
+
+def split_batches(vectors: List[Dict[str, Any]], max_items: Optional[int] = None,
+                  max_bytes: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    max_items = max(1, max_items or settings.upsert_batch_size)
+    max_bytes = max(1, max_bytes or settings.upsert_batch_max_bytes)
+    batches, current, current_bytes = [], [], 0
+    for vector in vectors:
+        size = vector_payload_bytes(vector)
+        if current and (len(current) >= max_items or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(vector)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _send(store, batch: List[Dict[str, Any]], namespace: Optional[str]) -> Optional[Exception]:
+    """Upsert one batch with retries; returns the last error if every attempt failed."""
+    attempts = max(1, settings.upsert_max_retries + 1)
+    for attempt in range(1, attempts + 1):
+        try:
+            with timed("upsert.batch"):
+                store.upsert(batch, namespace=namespace)
+            return None
+        except Exception as e:
+            if attempt == attempts:
+                return e
+            delay = settings.upsert_retry_backoff_seconds * (2 ** (attempt - 1))
+            logger.warning(f"Upsert of {len(batch)} vectors failed (attempt {attempt}/{attempts}): {e}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return None
+
+
+def upsert_in_batches(store, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Upsert `vectors` through `store` (a services.vector_store.VectorStore).
+    Returns counts and vectors/second; raises RuntimeError if any batch still
+    failed after its retries (the other batches are kept).
+    """
+    if not vectors:
+        return {"upserted": 0, "batches": 0, "failed_batches": 0, "seconds": 0.0, "vectors_per_s": None}
+
+    batches = split_batches(vectors)
+    start = time.perf_counter()
+    workers = max(1, min(settings.upsert_max_concurrency, len(batches)))
+    if workers == 1:
+        errors = [_send(store, batch, namespace) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(lambda batch: _send(store, batch, namespace), batches))
+    elapsed = time.perf_counter() - start
+
+    failed = [(batch, error) for batch, error in zip(batches, errors) if error is not None]
+    upserted = len(vectors) - sum(len(batch) for batch, _ in failed)
+    report = {
+        "upserted": upserted,
+        "batches": len(batches),
+        "failed_batches": len(failed),
+        "seconds": round(elapsed, 3),
+        "vectors_per_s": round(upserted / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info(
+        f"Upserted {upserted}/{len(vectors)} vectors in {len(batches)} batches "
+        f"({workers} concurrent) in {elapsed:.2f}s, {report['vectors_per_s']} vectors/s"
+    )
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(batches)} upsert batches failed "
+            f"({len(vectors) - upserted} vectors); last error: {failed[-1][1]}"
+        )
+    return report
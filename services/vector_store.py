@@ -0,0 +1,692 @@
+# services/vector_store.py
+"""
+Vector store backends.
+
+`VectorStore` is the small surface pinecone_service needs (upsert, query, fetch,
+delete, list ids, stats). `PineconeVectorStore` wraps a Pinecone index; `LocalVectorStore`
+keeps normalized vectors (float32, float16 or int8) in append-only memory-mapped files, one
+partition per user, shared by the processes of one host, and answers queries with exact cosine
+top-k. Select with VECTOR_STORE_BACKEND.
+"""
+import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+
+from logger_config import logger
+from services.vector_codec import QuantizedMatrix, check_dtype
+
+DEFAULT_NAMESPACE = "__default__"
+
+
+class VectorStore(ABC):
+    """Common interface. Matches are plain dicts: {"id", "score", "metadata"[, "values"]}."""
+
+    @abstractmethod
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def query(self, vector, top_k: int, filter: Optional[Dict[str, Any]] = None, namespace: Optional[str] = None,
+              include_metadata: bool = True, include_values: bool = False) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, filter: Optional[Dict[str, Any]] = None,
+               namespace: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_ids(self, namespace: Optional[str] = None, prefix: Optional[str] = None) -> Iterator[List[str]]:
+        """Pages of vector ids in `namespace`."""
+
+    @abstractmethod
+    def describe_index_stats(self) -> Dict[str, Any]:
+        ...
+
+
+def _get(obj, key, default=None):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+class PineconeVectorStore(VectorStore):
+    """
+    Adapter over a Pinecone `Index` that normalizes responses to plain dicts.
+    Pass `index_factory` to resolve the index on first use instead of at construction;
+    `request_timeout` is sent with every data-plane call.
+    """
+
+    def __init__(self, index=None, index_factory=None, request_timeout=None):
+        self._index = index
+        self._index_factory = index_factory
+        self._timeout = {"_request_timeout": request_timeout} if request_timeout else {}
+
+    @property
+    def index(self):
+        if self._index is None:
+            if self._index_factory is None:
+                raise RuntimeError("Pinecone index is not initialized")
+            self._index = self._index_factory()
+        return self._index
+
+    def upsert(self, vectors, namespace=None):
+        return self.index.upsert(vectors=vectors, namespace=namespace, **self._timeout)
+
+    def query(self, vector, top_k, filter=None, namespace=None, include_metadata=True, include_values=False):
+        resp = self.index.query(
+            vector=list(vector),
+            top_k=top_k,
+            filter=filter,
+            namespace=namespace,
+            include_metadata=include_metadata,
+            include_values=include_values,
+            **self._timeout,
+        )
+        matches = _get(resp, "matches") or _get(resp, "results") or []
+        normalized = []
+        for m in matches:
+            match = {"id": _get(m, "id"), "score": _get(m, "score"), "metadata": _get(m, "metadata") or {}}
+            if include_values:
+                match["values"] = _get(m, "values")
+            normalized.append(match)
+        return normalized
+
+    def fetch(self, ids, namespace=None):
+        resp = self.index.fetch(ids=ids, namespace=namespace, **self._timeout)
+        vectors = _get(resp, "vectors") or {}
+        return {
+            vid: {"id": vid, "values": _get(v, "values"), "metadata": _get(v, "metadata") or {}}
+            for vid, v in vectors.items()
+        }
+
+    def delete(self, ids=None, filter=None, namespace=None):
+        if ids:
+            return self.index.delete(ids=ids, namespace=namespace, **self._timeout)
+        if filter:
+            return self.index.delete(filter=filter, namespace=namespace, **self._timeout)
+        raise ValueError("Provide ids or filter")
+
+    def delete_namespace(self, namespace):
+        try:
+            self.index.delete(delete_all=True, namespace=namespace, **self._timeout)
+        except Exception as e:
+            # Deleting a namespace that was never written to is a 404 on serverless indexes
+            if "not found" not in str(e).lower():
+                raise
+
+    def list_ids(self, namespace=None, prefix=None):
+        # Serverless indexes only; pod-based indexes raise here
+        for page in self.index.list(prefix=prefix, namespace=namespace):
+            yield list(page)
+
+    def describe_index_stats(self):
+        return self.index.describe_index_stats(**self._timeout)
+
+
+# --- metadata filters (Pinecone filter syntax) -------------------------------------------
+
+def _compare(value, op: str, operand) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter against one metadata dict."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, op, operand) for op, operand in cond.items()):
+                return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+def _partition_key(flt: Optional[Dict[str, Any]]):
+    """Return the user_id a filter pins to with equality, or None if it spans users."""
+    if not flt or "user_id" not in flt:
+        return None
+    cond = flt["user_id"]
+    if isinstance(cond, dict):
+        return cond.get("$eq") if set(cond) == {"$eq"} else None
+    return cond
+
+
+# --- local backend -----------------------------------------------------------------------
+
+_EXTENSIONS = {"float32": "f32", "float16": "f16", "int8": "i8"}
+_LOG_FILE = "log.jsonl"
+_LOCK_FILE = ".lock"
+# Compact once dead (replaced/deleted) rows outnumber live ones and there are at least this many
+COMPACT_MIN_DEAD_ROWS = 1024
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path` across processes (flock; msvcrt on Windows)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class _Snapshot(NamedTuple):
+    """Immutable view of a partition; rows of replaced or deleted ids stay in place, marked dead."""
+    ids: List[str]
+    metadata: List[Dict[str, Any]]
+    vectors: QuantizedMatrix
+    alive: np.ndarray
+    rows: Dict[str, int]  # live id -> row
+
+    @property
+    def live(self) -> int:
+        return len(self.rows)
+
+
+def _empty_snapshot(dim: int = 0, dtype: str = "float32") -> _Snapshot:
+    return _Snapshot([], [], QuantizedMatrix.empty(dim, dtype), np.zeros(0, dtype=bool), {})
+
+
+class _Partition:
+    """
+    Vectors for one (namespace, user) pair, shared by every process using the same root.
+
+    On disk: `log.jsonl`, a header line ({"generation", "dim", "dtype"}) followed by
+    one {"id", "metadata"} line per appended row and {"delete": [ids]} tombstones, and
+    `vectors-<generation>.<f32|f16|i8>` (+ `scales-<generation>.f32` for int8) holding
+    the rows in log order, encoded as `dtype` (see services/vector_codec.py). Upserting
+    an existing id appends a new row and leaves the old one dead.
+
+    Writers hold `.lock` and catch up with the log before appending, so concurrent
+    processes never overwrite each other's rows; readers `refresh()` (one stat of the
+    log) and read whatever other processes appended. When dead rows outnumber live
+    ones the partition is compacted into a new generation, which is also how
+    partitions in another dtype or the older meta.json layout are re-encoded.
+    """
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = path
+        self.dtype = dtype
+        self.snapshot = _empty_snapshot(dtype=dtype)
+        self._lock = threading.RLock()
+        self._header: Optional[Dict[str, Any]] = None
+        self._log_id = None  # (inode, device) of the log read so far
+        self._offset = 0
+        self._legacy_stat = None
+
+    @property
+    def ids(self) -> List[str]:
+        snap = self.snapshot
+        return [snap.ids[row] for row in sorted(snap.rows.values())]
+
+    @property
+    def dim(self) -> int:
+        return self._header["dim"] if self._header else 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _vector_files(self, header: Dict[str, Any]):
+        generation, dtype = header["generation"], header["dtype"]
+        vectors = self._file(f"vectors-{generation}.{_EXTENSIONS[dtype]}")
+        scales = self._file(f"scales-{generation}.f32") if dtype == "int8" else None
+        return vectors, scales
+
+    def _map(self, header: Dict[str, Any], count: int) -> QuantizedMatrix:
+        if not count:
+            return QuantizedMatrix.empty(header["dim"], header["dtype"])
+        vectors, scales = self._vector_files(header)
+        codes = np.memmap(vectors, dtype=header["dtype"], mode="r", shape=(count, header["dim"]))
+        if scales is None:
+            return QuantizedMatrix(codes)
+        return QuantizedMatrix(codes, np.memmap(scales, dtype=np.float32, mode="r", shape=(count,)))
+
+    # --- reading ---------------------------------------------------------------------
+
+    def refresh(self) -> _Snapshot:
+        """Bring the snapshot up to date with what any process has written; returns it."""
+        with self._lock:
+            try:
+                st = os.stat(self._file(_LOG_FILE))
+            except FileNotFoundError:
+                self._load_legacy()
+                return self.snapshot
+            if (st.st_ino, st.st_dev) != self._log_id or st.st_size < self._offset:
+                self._read_log(full=True)
+            elif st.st_size > self._offset:
+                self._read_log(full=False)
+            return self.snapshot
+
+    def _read_log(self, full: bool) -> None:
+        try:
+            with open(self._file(_LOG_FILE), "rb") as f:
+                st = os.fstat(f.fileno())
+                if full:
+                    self._offset, self._header = 0, None
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            # Removed (namespace deleted) or swapped by a compaction between stat and open
+            self._reset()
+            return
+        # A writer may be mid-line; leave the partial tail for the next refresh
+        complete = data[:data.rfind(b"\n") + 1]
+        if not complete:
+            if full:
+                self._reset()
+            return
+        snap = _empty_snapshot() if full else self.snapshot
+        ids, metadata, rows = list(snap.ids), list(snap.metadata), dict(snap.rows)
+        alive = snap.alive.tolist()
+        header = self._header
+        for line in complete.splitlines():
+            record = json.loads(line)
+            if "generation" in record:
+                header = record
+            elif "delete" in record:
+                for vid in record["delete"]:
+                    row = rows.pop(vid, None)
+                    if row is not None:
+                        alive[row] = False
+            else:
+                vid = record["id"]
+                if vid in rows:
+                    alive[rows[vid]] = False
+                rows[vid] = len(ids)
+                ids.append(vid)
+                metadata.append(record["metadata"])
+                alive.append(True)
+        if header is None:
+            return
+        try:
+            vectors = self._map(header, len(ids))
+        except FileNotFoundError:
+            # Generation replaced by a compaction after the log was read: start over next time
+            self._reset()
+            return
+        self._header, self._log_id, self._offset = header, (st.st_ino, st.st_dev), self._offset + len(complete)
+        self.snapshot = _Snapshot(ids, metadata, vectors, np.asarray(alive, dtype=bool), rows)
+
+    def _load_legacy(self) -> None:
+        """Partitions written before the log layout: meta.json + vectors.<ext>, rewritten on the next write."""
+        meta_file = self._file("meta.json")
+        try:
+            stat = os.stat(meta_file)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if (stat.st_ino, stat.st_mtime_ns) == self._legacy_stat:
+            return
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        dtype = meta.get("dtype", "float32")
+        count = len(meta["ids"])
+        vectors = QuantizedMatrix.empty(meta["dim"], dtype)
+        if count:
+            codes = np.memmap(self._file(f"vectors.{_EXTENSIONS[dtype]}"), dtype=dtype, mode="r",
+                              shape=(count, meta["dim"]))
+            scales = None
+            if dtype == "int8":
+                scales = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(count,))
+            vectors = QuantizedMatrix(codes, scales)
+        rows = {vid: row for row, vid in enumerate(meta["ids"])}
+        self._header = {"generation": 0, "dim": meta["dim"], "dtype": dtype, "legacy": True}
+        self._legacy_stat = (stat.st_ino, stat.st_mtime_ns)
+        self.snapshot = _Snapshot(list(meta["ids"]), meta["metadata"], vectors, np.ones(count, dtype=bool), rows)
+
+    def _reset(self) -> None:
+        self._header, self._log_id, self._offset, self._legacy_stat = None, None, 0, None
+        self.snapshot = _empty_snapshot(dtype=self.dtype)
+
+    def live_vectors(self) -> np.ndarray:
+        """float32 copy of the live rows."""
+        snap = self.refresh()
+        return snap.vectors.decode(sorted(snap.rows.values()))
+
+    # --- writing ---------------------------------------------------------------------
+
+    def _append_log(self, records: List[Dict[str, Any]]) -> None:
+        with open(self._file(_LOG_FILE), "ab") as f:
+            # Drop a partial line left by a crashed writer
+            if f.tell() != self._offset:
+                f.truncate(self._offset)
+                f.seek(self._offset)
+            f.write(b"".join(json.dumps(r).encode("utf-8") + b"\n" for r in records))
+
+    @staticmethod
+    def _append_rows(path: str, array: np.ndarray, offset: int) -> None:
+        with open(path, "ab") as f:
+            # Drop rows a crashed writer left behind without logging them
+            if f.tell() != offset:
+                f.truncate(offset)
+                f.seek(offset)
+            f.write(np.ascontiguousarray(array).tobytes())
+
+    def _compact(self, snap: _Snapshot, dim: int) -> None:
+        """Rewrite the live rows as a new generation in `self.dtype`."""
+        generation = (self._header or {}).get("generation", 0) + 1
+        header = {"generation": generation, "dim": dim, "dtype": self.dtype}
+        live = sorted(snap.rows.values())
+        vectors = snap.vectors.take(live).astype(self.dtype) if live else QuantizedMatrix.empty(dim, self.dtype)
+        vector_file, scales_file = self._vector_files(header)
+        vectors.codes.tofile(vector_file)
+        if scales_file:
+            vectors.scales.tofile(scales_file)
+        tmp_log = self._file(_LOG_FILE + ".tmp")
+        with open(tmp_log, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for row in live:
+                f.write(json.dumps({"id": snap.ids[row], "metadata": snap.metadata[row]}).encode("utf-8") + b"\n")
+        old_files = [name for name in os.listdir(self.path) if name.startswith(("vectors", "scales")) or name == "meta.json"]
+        os.replace(tmp_log, self._file(_LOG_FILE))
+        keep = {os.path.basename(p) for p in (vector_file, scales_file) if p}
+        for name in old_files:
+            if name not in keep:
+                try:
+                    os.remove(self._file(name))
+                except OSError:
+                    # Still mapped by a reader (Windows); removed with the next compaction
+                    pass
+        with self._lock:
+            self._read_log(full=True)
+
+    def _needs_compaction(self, snap: _Snapshot) -> bool:
+        dead = len(snap.ids) - snap.live
+        return dead >= COMPACT_MIN_DEAD_ROWS and dead > snap.live
+
+    def upsert(self, ids, metadata, vectors: np.ndarray):
+        os.makedirs(self.path, exist_ok=True)
+        with _file_lock(self._file(_LOCK_FILE)):
+            snap = self.refresh()
+            dim = self.dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match partition dimension {dim}")
+            header = self._header
+            if header is None or header.get("legacy") or header["dtype"] != self.dtype:
+                self._compact(snap, dim)
+                snap, header = self.snapshot, self._header
+            encoded = QuantizedMatrix.encode(vectors, self.dtype)
+            vector_file, scales_file = self._vector_files(header)
+            rows = len(snap.ids)
+            self._append_rows(vector_file, encoded.codes, rows * dim * np.dtype(self.dtype).itemsize)
+            if scales_file:
+                self._append_rows(scales_file, encoded.scales, rows * 4)
+            self._append_log([{"id": vid, "metadata": meta} for vid, meta in zip(ids, metadata)])
+            snap = self.refresh()
+            if self._needs_compaction(snap):
+                self._compact(snap, dim)
+
+    def delete(self, ids=None, flt=None) -> int:
+        snap = self.refresh()
+        if not snap.live or (not flt and not set(ids or []) & snap.rows.keys()):
+            return 0
+        with _file_lock(self._file(_LOCK_FILE)):
+            snap = self.refresh()
+            drop = set(ids or []) & set(snap.rows)
+            if flt:
+                drop.update(vid for vid, row in snap.rows.items() if matches_filter(snap.metadata[row], flt))
+            if not drop:
+                return 0
+            self._append_log([{"delete": sorted(drop)}])
+            snap = self.refresh()
+            if self._needs_compaction(snap):
+                self._compact(snap, self.dim)
+        return len(drop)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact-search store on the local filesystem, safe to share between processes on one host.
+
+    Layout: <root>/<namespace>/user_<user_id>/ (see `_Partition`). Queries whose filter
+    pins `user_id` only touch that user's partition; others scan all partitions. Scores
+    are cosine similarity computed with one matrix-vector product per partition,
+    directly on the stored `dtype` codes.
+    """
+
+    def __init__(self, root: str, dtype: str = "float32"):
+        self.root = root
+        self.dtype = check_dtype(dtype)
+        self._partitions: Dict[tuple, _Partition] = {}
+        # namespace -> {vector id: user key of the partition holding it}, built on the first upsert.
+        # Kept per process: an id moved to another user by a different process is not seen here.
+        self._owners: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    def _partition(self, namespace: Optional[str], user_id) -> _Partition:
+        key = (namespace or DEFAULT_NAMESPACE, str(user_id))
+        with self._lock:
+            part = self._partitions.get(key)
+            if part is None:
+                part = _Partition(os.path.join(self.root, key[0], f"user_{key[1]}"), self.dtype)
+                self._partitions[key] = part
+            return part
+
+    def _user_keys(self, namespace: Optional[str]) -> List[str]:
+        ns_dir = os.path.join(self.root, namespace or DEFAULT_NAMESPACE)
+        if not os.path.isdir(ns_dir):
+            return []
+        return sorted(d[len("user_"):] for d in os.listdir(ns_dir) if d.startswith("user_"))
+
+    def _all_partitions(self, namespace: Optional[str]) -> List[_Partition]:
+        ns = namespace or DEFAULT_NAMESPACE
+        return [self._partition(ns, u) for u in self._user_keys(ns)]
+
+    def _owner_map(self, namespace: Optional[str]) -> Dict[str, str]:
+        ns = namespace or DEFAULT_NAMESPACE
+        owners = self._owners.get(ns)
+        if owners is None:
+            owners = {}
+            for user_key in self._user_keys(ns):
+                for vid in self._partition(ns, user_key).refresh().rows:
+                    owners[vid] = user_key
+            self._owners[ns] = owners
+        return owners
+
+    def upsert(self, vectors, namespace=None):
+        grouped: Dict[str, list] = {}
+        for v in vectors:
+            grouped.setdefault(str((v.get("metadata") or {}).get("user_id")), []).append(v)
+        with self._lock:
+            # An id lives in exactly one partition: if its user changed, drop the copy where it was
+            owners = self._owner_map(namespace)
+            moved: Dict[str, List[str]] = {}
+            for user_key, items in grouped.items():
+                for v in items:
+                    previous = owners.get(v["id"])
+                    if previous is not None and previous != user_key:
+                        moved.setdefault(previous, []).append(v["id"])
+            for user_key, ids in moved.items():
+                self._partition(namespace, user_key).delete(ids=ids)
+            for user_key, items in grouped.items():
+                matrix = _normalize(np.asarray([v["values"] for v in items], dtype=np.float32))
+                self._partition(namespace, user_key).upsert(
+                    [v["id"] for v in items], [dict(v.get("metadata") or {}) for v in items], matrix
+                )
+                for v in items:
+                    owners[v["id"]] = user_key
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k, filter=None, namespace=None, include_metadata=True, include_values=False):
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0 or top_k <= 0:
+            return []
+        q = q / norm
+
+        user_id = _partition_key(filter)
+        parts = [self._partition(namespace, user_id)] if user_id is not None else self._all_partitions(namespace)
+        # Only the partition key in the filter? Then every row in the partition qualifies.
+        needs_mask = bool(filter) and not (user_id is not None and len(filter) == 1)
+
+        candidates = []
+        for part in parts:
+            snap = part.refresh()
+            if not snap.live or snap.vectors.shape[1] != q.shape[0]:
+                continue
+            scores = snap.vectors.dot(q)
+            mask = snap.alive
+            if needs_mask:
+                mask = mask & np.fromiter(
+                    (matches_filter(m, filter) for m in snap.metadata), dtype=bool, count=len(snap.ids)
+                )
+            if not mask.all():
+                scores = np.where(mask, scores, -np.inf)
+            k = min(top_k, len(snap.ids))
+            top = np.argpartition(-scores, k - 1)[:k]
+            for i in top:
+                if np.isfinite(scores[i]):
+                    candidates.append((float(scores[i]), snap, int(i)))
+
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        matches = []
+        for score, snap, i in candidates[:top_k]:
+            match = {"id": snap.ids[i], "score": score}
+            if include_metadata:
+                match["metadata"] = dict(snap.metadata[i])
+            if include_values:
+                match["values"] = snap.vectors.decode([i])[0].tolist()
+            matches.append(match)
+        return matches
+
+    def fetch(self, ids, namespace=None):
+        found = {}
+        for part in self._all_partitions(namespace):
+            snap = part.refresh()
+            for vid in ids:
+                row = snap.rows.get(vid)
+                if row is not None:
+                    found[vid] = {
+                        "id": vid,
+                        "values": snap.vectors.decode([row])[0].tolist(),
+                        "metadata": dict(snap.metadata[row]),
+                    }
+        return found
+
+    def delete(self, ids=None, filter=None, namespace=None):
+        if not ids and not filter:
+            raise ValueError("Provide ids or filter")
+        user_id = _partition_key(filter)
+        removed = 0
+        with self._lock:
+            parts = [self._partition(namespace, user_id)] if user_id is not None else self._all_partitions(namespace)
+            for part in parts:
+                removed += part.delete(ids=ids, flt=filter)
+            ns = namespace or DEFAULT_NAMESPACE
+            if filter:
+                # Rebuilt from disk on the next upsert
+                self._owners.pop(ns, None)
+            elif ns in self._owners:
+                for vid in ids:
+                    self._owners[ns].pop(vid, None)
+        return {"deleted_count": removed}
+
+    def delete_namespace(self, namespace):
+        ns = namespace or DEFAULT_NAMESPACE
+        with self._lock:
+            for key in [k for k in self._partitions if k[0] == ns]:
+                del self._partitions[key]
+            self._owners.pop(ns, None)
+            shutil.rmtree(os.path.join(self.root, ns), ignore_errors=True)
+
+    def list_ids(self, namespace=None, prefix=None):
+        for part in self._all_partitions(namespace):
+            part.refresh()
+            ids = [vid for vid in part.ids if not prefix or vid.startswith(prefix)]
+            if ids:
+                yield ids
+
+    def describe_index_stats(self):
+        namespaces = {}
+        dimension = None
+        vector_bytes = 0
+        if os.path.isdir(self.root):
+            for ns in sorted(os.listdir(self.root)):
+                snaps = [(p, p.refresh()) for p in self._all_partitions(ns)]
+                namespaces[ns] = {"vector_count": sum(s.live for _, s in snaps)}
+                dimension = dimension or next((p.dim for p, _ in snaps if p.dim), None)
+                vector_bytes += sum(s.vectors.nbytes for _, s in snaps)
+        return {
+            "dimension": dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+            "vector_dtype": self.dtype,
+            "vector_bytes": vector_bytes,
+        }
+
+
+def create_vector_store(backend: str, pinecone_index=None, local_dir: Optional[str] = None,
+                        pinecone_index_factory=None, request_timeout=None,
+                        local_dtype: str = "float32") -> VectorStore:
+    backend = (backend or "pinecone").lower()
+    if backend == "local":
+        logger.info("Using local vector store at %s (%s vectors)", local_dir, local_dtype)
+        return LocalVectorStore(local_dir, dtype=local_dtype)
+    if backend == "pinecone":
+        return PineconeVectorStore(pinecone_index, index_factory=pinecone_index_factory, request_timeout=request_timeout)
+    raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
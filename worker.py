@@ -0,0 +1,65 @@
+# worker.py
+"""
+Standalone document indexing worker.
+
+Usage:
+    python worker.py [--concurrency N]
+
+Claims jobs from the indexing_jobs table (see services/jobs.py) and runs up to
+N of them at once. Run as many of these as ingest needs and set
+INDEXING_WORKERS_IN_API=0 on the API so it only enqueues. A worker on another
+machine needs the shared database, the uploaded files (DOCUMENTS_DIR) and
+shared indexes: VECTOR_STORE_BACKEND=pinecone and LEXICAL_INDEX_BACKEND=postgres.
+The local vector store and the SQLite lexical index live on one host, so with a
+shared database the worker refuses to start on them unless
+INDEXING_WORKER_SAME_HOST=true says it runs next to the API. The API's caches
+follow finished jobs through the database, wherever the worker runs.
+
+SIGINT/SIGTERM stop claiming new jobs and give running ones a grace period;
+anything still unfinished is re-claimed by another worker once its lease expires.
+"""
+import argparse
+import signal
+import threading
+
+from config import settings
+from db.database import init_db
+from logger_config import logger
+from services.indexing_worker import IndexingWorkerPool, host_local_backends
+from services.pdf_extract import shutdown_extraction_pool
+from services.pinecone_client import warm_up
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run document indexing workers")
+    parser.add_argument("--concurrency", type=int, default=settings.indexing_worker_concurrency,
+                        help="jobs processed at once (default: INDEXING_WORKER_CONCURRENCY)")
+    parser.add_argument("--grace", type=float, default=30.0,
+                        help="seconds to wait for running jobs on shutdown")
+    args = parser.parse_args()
+
+    local = host_local_backends()
+    if local and not settings.DATABASE_URL.startswith("sqlite") and not settings.indexing_worker_same_host:
+        # A worker on another machine would index into its own copy, invisible to the API
+        parser.exit(2, f"worker.py: host-local backends configured: {', '.join(local)}. Remote workers need "
+                       f"VECTOR_STORE_BACKEND=pinecone and LEXICAL_INDEX_BACKEND=postgres; set "
+                       f"INDEXING_WORKER_SAME_HOST=true if this worker shares the API's host and DATA_DIR.\n")
+    if local:
+        logger.warning("Indexing into host-local backends (%s); the API must run on this host", ", ".join(local))
+
+    init_db()
+    warm_up()
+    pool = IndexingWorkerPool(args.concurrency)
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    pool.start()
+    stop.wait()
+    logger.info("Shutting down indexing workers")
+    pool.stop(args.grace)
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    main()